@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+'''
+Brighten a theme's worth of colors one at a time and as a single palette.
+
+    python benchmarks/palette.py [colors]
+'''
+
+import sys
+import time
+
+from clevercss import values
+
+def one_by_one(colors, amount):
+    return [color.brighten(amount) for color in colors]
+
+def batched(colors, amount):
+    return values.ColorArray(colors).brighten(amount)
+
+def main(count=10000):
+    colors = [values.Color.make((i % 256, i * 7 % 256, i * 13 % 256)) for i in xrange(count)]
+    amount = values.number('10%')
+    print '%d colors, numpy %s\n' % (count, values._load_numpy() and 'installed' or 'missing')
+    for name, func in (('one by one', one_by_one), ('batched', batched)):
+        start = time.time()
+        func(colors, amount)
+        print '%-12s %8.1fms' % (name, (time.time() - start) * 1000)
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
+
+# vim: et sw=4 sts=4
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+'''
+The compiled speedups against their pure-Python twins, function by
+function, and a whole translation with and without them.
+
+    python setup.py build_ext --inplace
+    python benchmarks/speedups.py [rules]
+'''
+
+import operator
+import sys
+import time
+
+from clevercss import values, ctranslator, bench, cache
+from clevercss.ctranslator import CCSS, new_scope, ast
+
+_speedups = values._speedups
+
+def timed(func, *args):
+    best = None
+    for i in xrange(3):
+        start = time.time()
+        func(*args)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best * 1000
+
+def many(func, args, times=20000):
+    def meta():
+        for i in xrange(times):
+            func(*args)
+    return meta
+
+def translate(tree, translators, indent, get_selector):
+    saved = dict((cls, CCSS.register[cls]) for cls in translators)
+    saved_indent, saved_selector = ctranslator.indent, ctranslator.get_selector
+    CCSS.register.update(translators)
+    ctranslator.indent, ctranslator.get_selector = indent, get_selector
+    try:
+        return CCSS.translate(tree, new_scope(indent=2))
+    finally:
+        CCSS.register.update(saved)
+        ctranslator.indent, ctranslator.get_selector = saved_indent, saved_selector
+
+def main(rules=300):
+    if _speedups is None:
+        print 'the speedups are not built; run "python setup.py build_ext --inplace"'
+        return
+    rows = tuple((i % 256, i * 7 % 256, i * 13 % 256) for i in xrange(values.NUMPY_MIN - 1))
+    cases = [
+        ('parse_number', values.py_parse_number, _speedups.parse_number, ('-12.5px',)),
+        ('number_calc', values.py_number_calc, _speedups.number_calc,
+            ((12, 'px'), (3, None), operator.add)),
+        ('combine_rows', values.py_combine_rows, _speedups.combine_rows,
+            (operator.mul, rows, (1.1,))),
+        ('indent', ctranslator.PURE['indent'], _speedups.indent, ('top: 0;\nleft: 0;\n', 4)),
+    ]
+    print '%-14s %12s %12s %8s' % ('', 'python (ms)', 'cython (ms)', 'speedup')
+    for name, pure, fast, args in cases:
+        slow, quick = timed(many(pure, args)), timed(many(fast, args))
+        print '%-14s %12.1f %12.1f %7.1fx' % (name, slow, quick, slow / quick)
+
+    tree = cache.raw_parse(bench.generate(rules, 3))
+    pure = ctranslator.PURE
+    slow = timed(translate, tree, {ast.BinOp: pure[ast.BinOp], ast.Atomic: pure[ast.Atomic]},
+                 pure['indent'], pure['get_selector'])
+    quick = timed(translate, tree, {ast.BinOp: _speedups.binop, ast.Atomic: _speedups.atomic},
+                  _speedups.indent, _speedups.get_selector)
+    print '%-14s %12.1f %12.1f %7.1fx' % ('translate', slow, quick, slow / quick)
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
+
+# vim: et sw=4 sts=4
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+'''
+Memory and throughput of the slotted, interned values against the plain
+dict-backed objects they replaced.
+
+    python benchmarks/values.py [rules]
+'''
+
+import gc
+import re
+import sys
+import time
+
+from clevercss import values
+
+class DictNumber(object):
+    '''The Number of clevercss 0.5: a __dict__ per instance, parsed every time.'''
+    rx = re.compile(r'(-?(?:\d+(?:\.\d+)?|\.\d+))(px|em|%|pt)?')
+    def __init__(self, value, raw=True):
+        if raw:
+            num, units = self.rx.match(value).groups()
+            num = float(num)
+            if int(num) == num:
+                num = int(num)
+            value = num, units
+        self.value = value
+
+    def __add__(self, other):
+        return DictNumber((self.value[0] + other.value[0], self.value[1]), False)
+
+def literals(rules):
+    '''The number literals of a stylesheet with the given number of rules.'''
+    units = ('px', 'em', '%', '')
+    for i in xrange(rules):
+        for j in xrange(8):
+            yield '%d%s' % ((i * j) % 20, units[j % 4])
+
+def timed(func, *args):
+    start = time.time()
+    result = func(*args)
+    return result, time.time() - start
+
+def build(make, texts):
+    return [make(text) for text in texts]
+
+def double_all(items):
+    return [item + item for item in items]
+
+def size_of(obj):
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+def main(rules=20000):
+    texts = list(literals(rules))
+    gc.collect()
+    print '%d number literals from %d rules\n' % (len(texts), rules)
+    print '%-22s %14s %14s %14s' % ('', 'bytes/object', 'build (ms)', 'add (ms)')
+    for name, make, cls in (('dict-backed', DictNumber, DictNumber),
+                            ('slotted, interned', values.number, values.Number)):
+        items, build_time = timed(build, make, texts)
+        if cls is DictNumber:
+            items = [DictNumber(item.value, False) for item in items]
+        else:
+            items = [values.Number.make(item.value) for item in items]
+        result, add_time = timed(double_all, items)
+        distinct = len(set(id(item) for item in build(make, texts)))
+        print '%-22s %14d %14.1f %14.1f   (%d distinct objects)' % (name,
+                size_of(items[0]), build_time * 1000, add_time * 1000, distinct)
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
+
+# vim: et sw=4 sts=4
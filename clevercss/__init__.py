@@ -1,15 +1,147 @@
 #!/usr/bin/env python
 
-from grammar import grammar
-from translator import translate
-import consts
+import sys
+import types
 
-from ctranslator import CCSS
+import consts
 
 VERSION = '0.5'
 
-def convert(source, variables={}, indent=2, fname=None, minified=False):
-    """Convert CleverCSS text into normal CSS."""
-    return CCSS.from_string(source, indent=indent, fname=fname, minified=minified, variables={})
+## Building the grammar and the translator takes most of the time of
+## importing the compiler, so nothing here imports them until a conversion
+## actually needs them; "ccss --version" and the like never do.
+
+def translate(*args, **kwargs):
+    """The old translator; see translator.translate."""
+    import translator
+    return translator.translate(*args, **kwargs)
+
+def convert(source, variables={}, indent=2, fname=None, minified=False, profiler=None):
+    """Convert CleverCSS text into normal CSS.
+
+    `variables` are defined before the stylesheet runs, so it can use them
+    and its own assignments override them; strings are parsed as
+    expressions, like "10px" or "#333".
+
+    With a `profiler.Profiler`, the caches are bypassed and the time spent
+    in each phase and on each type of node is recorded in it.
+    """
+    import cache
+    from ctranslator import CCSS, new_scope
+    if profiler is not None:
+        tree = cache.raw_parse(source, profiler)
+        scope = new_scope(indent=indent, fname=fname, minified=minified, variables=variables,
+                          profiler=profiler)
+        with profiler.translating():
+            return CCSS.translate(tree, scope)
+    return _convert_one(source, None, variables, dict(indent=indent, fname=fname, minified=minified))
+
+def convert_iter(source, variables={}, indent=2, fname=None, minified=False):
+    """Convert CleverCSS text into normal CSS, yielding it chunk by chunk.
+
+    Errors in the source may only be raised while iterating.
+    """
+    import cache
+    from ctranslator import new_scope, iter_css
+    results = cache.result_cache
+    if results is not None:
+        css = results.get(cache.result_key(VERSION, source, variables, indent, minified))
+        if css is not None:
+            return iter([css])
+    tree = cache.parse(source)
+    scope = new_scope(indent=indent, fname=fname, minified=minified, variables=variables)
+    return iter_css(tree, scope)
+
+def convert_to(source, out, variables={}, indent=2, fname=None, minified=False):
+    """Convert CleverCSS text into normal CSS, writing it to the file `out`
+    as it goes.
+
+    `source` is a string or an iterable of lines, like an open file or
+    `lines.read_lines(fp)`. Each top-level statement is parsed, translated
+    and written before the next one is read, so neither the source nor the
+    css is ever held in full. The caches are bypassed, and errors in the
+    source may be raised after part of the css has been written.
+    """
+    import lines
+    from ctranslator import new_scope, emit
+    scope = new_scope(indent=indent, fname=fname, minified=minified, variables=variables)
+    for statement in lines.iter_statements(source):
+        chunks = []
+        emit(statement, scope, chunks)
+        out.write(''.join(chunks))
+
+def convert_many(source, variable_sets, indent=2, fname=None, minified=False, processes=None):
+    """Convert one stylesheet once for each dict of `variables` in
+    `variable_sets`, yielding the CSS of each in order.
+
+    The source is parsed once; with `processes`, the translating is spread
+    over that many worker processes.
+    """
+    import cache
+    ## parse errors show up here, and the workers get the parsed tree
+    tree = cache.parse(source)
+    options = dict(indent=indent, fname=fname, minified=minified)
+    if not processes or processes < 2:
+        for variables in variable_sets:
+            yield _convert_one(source, tree, variables or {}, options)
+        return
+    import multiprocessing
+    ## in the form the disk cache stores it, which pickles and loads much
+    ## faster than the source parses
+    pool = multiprocessing.Pool(processes, _init_many, (source, cache.dump_tree(tree), options))
+    try:
+        for css in pool.imap(_convert_in_worker, variable_sets):
+            yield css
+    finally:
+        pool.terminate()
+
+def _convert_one(source, tree, variables, options):
+    '''Convert through the result cache; `tree` is parsed from `source` if
+    it is None and needed.'''
+    import cache
+    from ctranslator import CCSS, new_scope
+    results = cache.result_cache
+    if results is not None:
+        key = cache.result_key(VERSION, source, variables, options['indent'], options['minified'])
+        css = results.get(key)
+        if css is not None:
+            return css
+    if tree is None:
+        tree = cache.parse(source)
+    css = CCSS.translate(tree, new_scope(variables=variables, **options))
+    if results is not None:
+        results.set(key, css)
+    return css
+
+_many = None
+
+def _init_many(source, data, options):
+    global _many
+    import cache
+    _many = source, cache.load_tree(data), options
+
+def _convert_in_worker(variables):
+    source, tree, options = _many
+    return _convert_one(source, tree, variables or {}, options)
+
+class _Package(types.ModuleType):
+    '''The package, with the Grammar instance and the translator as the
+    `grammar` and `CCSS` attributes they always were, imported on first use.'''
+    @property
+    def grammar(self):
+        from grammar import grammar
+        return grammar
+
+    @property
+    def CCSS(self):
+        from ctranslator import CCSS
+        return CCSS
+
+_package = _Package(__name__, __doc__)
+_package.__dict__.update(globals())
+## the functions above keep this module's globals, which a module clears
+## when it is freed
+_package._module = sys.modules[__name__]
+sys.modules[__name__] = _package
 
 # vim: et sw=4 sts=4
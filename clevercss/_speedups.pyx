@@ -0,0 +1,163 @@
+'''
+Compiled versions of the hottest pure-Python functions of clevercss.
+
+Build it with "python setup.py build_ext --inplace". values.py and
+ctranslator.py use these when the extension can be imported and fall back
+to their own pure-Python versions otherwise, so both must behave the same.
+'''
+
+import operator
+
+cdef extern from "math.h":
+    double floor(double)
+
+cdef object _add = operator.add
+cdef object _sub = operator.sub
+cdef object _mul = operator.mul
+cdef object _div = operator.div
+
+## values.py
+
+def parse_number(text):
+    '''Split a number literal into its value and units.'''
+    cdef Py_ssize_t i = 0, n = len(text), digits
+    if i < n and text[i] == '-':
+        i += 1
+    digits = i
+    while i < n and '0' <= text[i] <= '9':
+        i += 1
+    if i > digits:
+        if i + 1 < n and text[i] == '.' and '0' <= text[i + 1] <= '9':
+            i += 2
+            while i < n and '0' <= text[i] <= '9':
+                i += 1
+    elif i + 1 < n and text[i] == '.' and '0' <= text[i + 1] <= '9':
+        i += 2
+        while i < n and '0' <= text[i] <= '9':
+            i += 1
+    else:
+        raise ValueError("invalid number '%s'" % text.encode('string_escape'))
+    num = float(text[:i])
+    if int(num) == num:
+        num = int(num)
+    units = None
+    for unit in ('px', 'em', '%', 'pt'):
+        if text.startswith(unit, i):
+            units = unit
+            break
+    return num, units
+
+def number_calc(tuple left, tuple right, op, bint reverse=False):
+    '''Do math on the values of two Numbers; None if it can't be done.'''
+    if reverse:
+        newvalue = op(right[0], left[0])
+    else:
+        newvalue = op(left[0], right[0])
+    lunits, runits = left[1], right[1]
+    if runits == lunits:
+        return newvalue, lunits
+    elif lunits and runits:
+        raise ValueError('cannot do math on numbers of differing units')
+    elif lunits:
+        return newvalue, lunits
+    elif runits:
+        return newvalue, runits
+    return None
+
+cdef inline int channel(double value):
+    value = floor(value + .5)
+    if value < 0:
+        return 0
+    elif value > 255:
+        return 255
+    return <int>value
+
+cdef inline double apply(int kind, double a, double b) except? -1:
+    if kind == 0:
+        return a + b
+    elif kind == 1:
+        return a - b
+    elif kind == 2:
+        return a * b
+    if b == 0:
+        raise ZeroDivisionError('float division by zero')
+    return a / b
+
+cdef tuple broadcast(item, Py_ssize_t count):
+    if isinstance(item, (int, long, float)):
+        return ((item,) * 3,) * count
+    elif not isinstance(item[0], (tuple, list)):
+        return (tuple(item),) * count
+    return tuple(item)
+
+def combine_rows(func, tuple rows, tuple others):
+    '''values.combine_rows: apply `func` channel by channel, then round and
+    clamp. The four arithmetic operators are done in C.'''
+    cdef Py_ssize_t i, count = len(rows)
+    cdef int kind = -1
+    cdef tuple left, right, other
+    if len(others) == 1:
+        if func is _add:
+            kind = 0
+        elif func is _sub:
+            kind = 1
+        elif func is _mul:
+            kind = 2
+        elif func is _div:
+            kind = 3
+    if kind != -1:
+        other = broadcast(others[0], count)
+        result = []
+        for i in range(count):
+            left, right = rows[i], other[i]
+            result.append((channel(apply(kind, left[0], right[0])),
+                           channel(apply(kind, left[1], right[1])),
+                           channel(apply(kind, left[2], right[2]))))
+        return tuple(result)
+    columns = [rows] + [broadcast(item, count) for item in others]
+    return tuple(tuple(channel(func(*map(float, values))) for values in zip(*colors))
+                 for colors in zip(*columns))
+
+## ctranslator.py
+
+cdef object translator, operators, ast, TranslateError
+
+def install(ccss, ops, ast_classes, error):
+    '''Hand over what the translators below need from ctranslator.'''
+    global translator, operators, ast, TranslateError
+    translator, operators, ast, TranslateError = ccss, ops, ast_classes, error
+
+def binop(node, scope):
+    result = translator.translate(node.left, scope)
+    for op, value in zip(node.ops, node.values):
+        try:
+            nv = translator.translate(value, scope)
+            result = operators[op.value](result, nv)
+        except TypeError:
+            print [result, nv]
+            raise
+    return result
+
+def atomic(node, scope):
+    value = translator.translate(node.literal, scope)
+    for post in node.posts:
+        if isinstance(post, ast.post_attr):
+            value = getattr(value, str(post.name.value))
+        elif isinstance(post, ast.post_subs):
+            sub = translator.translate(post.subscript, scope)
+            value = value.__getitem__(sub)
+        elif isinstance(post, ast.post_call):
+            args = [translator.translate(arg, scope) for arg in post.args]
+            value = value(*args)
+        else:
+            raise TranslateError('invalid postfix operation found: %s' % repr(post))
+    return value
+
+def indent(text, int num):
+    white = ' ' * num
+    return ''.join([white + line for line in text.splitlines(True)])
+
+def get_selector(scope):
+    return ', '.join(scope.rule_stack[-1])
+
+# vim: et sw=4 sts=4
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+'''
+Compiling without blocking the caller, for event-loop based servers.
+
+`convert` takes the same arguments as `clevercss.convert`, hands the work
+to a pool of worker processes and returns a `Future` straight away:
+
+    future = clevercss.aio.convert(source, indent=4)
+    future.add_done_callback(lambda future: respond(future.result()))
+
+Futures have the interface of `concurrent.futures.Future` (done, result,
+exception and add_done_callback), but their callbacks run in a thread of
+the pool, so hand the result to your event loop the way it takes them from
+other threads (`IOLoop.add_callback`, `reactor.callFromThread`,
+`loop.call_soon_threadsafe`...).
+
+Requests for the same source and options while one is being compiled share
+its future, and finished ones are looked up in `cache.result_cache` first.
+At most `max_running` compiles run at once and `max_waiting` wait for their
+turn; beyond that `convert` raises `Busy` instead of queueing more. A
+compile whose job fails in the pool (say, a worker dies) or that runs for
+longer than `timeout` seconds fails with the pool's error or `Timeout`,
+and makes room for the next. `configure` sets up the pool and these limits.
+'''
+
+import collections
+import threading
+import time
+import traceback
+
+from server import RemoteError, compile_request, init_worker
+import clevercss
+import cache
+
+class Busy(Exception):
+    '''Too many compiles are waiting already.'''
+
+class Timeout(Exception):
+    pass
+
+class Future(object):
+    '''The result of a compile that may not have finished yet.'''
+    def __init__(self):
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._result = None
+        self._error = None
+
+    def done(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        '''The css, waiting for it if needed; raises whatever the compile
+        raised.'''
+        error = self.exception(timeout)
+        if error is not None:
+            raise error
+        return self._result
+
+    def exception(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise Timeout('the compile did not finish in %s seconds' % timeout)
+        return self._error
+
+    def add_done_callback(self, func):
+        '''Call `func(future)` once it is done (now, if it is already).'''
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(func)
+                return
+        func(self)
+
+    def set_result(self, result):
+        self._finish(result, None)
+
+    def set_exception(self, error):
+        self._finish(None, error)
+
+    def _finish(self, result, error):
+        with self._lock:
+            self._result, self._error = result, error
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for func in callbacks:
+            ## they run in a thread of the pool, which must not die of them
+            try:
+                func(self)
+            except Exception:
+                traceback.print_exc()
+
+class Compiler(object):
+    '''Compiles in a process pool; `pool` may be any object with the
+    apply_async of `multiprocessing.Pool`, which is made if it isn't given.
+
+    Every `poll_interval` seconds a thread checks on the running jobs (see
+    `check`); with None, nothing does until `check` is called.
+    '''
+    def __init__(self, processes=None, max_running=None, max_waiting=100, pool=None,
+                 timeout=60, poll_interval=1.0):
+        if pool is None:
+            import multiprocessing
+            pool = multiprocessing.Pool(processes, init_worker)
+            processes = processes or multiprocessing.cpu_count()
+        self.pool = pool
+        self.max_running = max_running or (processes or 1) * 2
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.running = {}
+        ## key -> (AsyncResult, start time) of each running compile
+        self.jobs = {}
+        self.waiting = collections.deque()
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        if poll_interval is not None:
+            watcher = threading.Thread(target=self._watch, args=(poll_interval,))
+            watcher.daemon = True
+            watcher.start()
+
+    def convert(self, source, variables={}, indent=2, fname=None, minified=False):
+        '''Like clevercss.convert, but returns a Future of the css.'''
+        key = cache.result_key(clevercss.VERSION, source, variables, indent, minified), fname
+        results = cache.result_cache
+        css = results is not None and results.get(key[0]) or None
+        if css is not None:
+            future = Future()
+            future.set_result(css)
+            return future
+        options = {'variables': variables, 'indent': indent, 'fname': fname, 'minified': minified}
+        with self._lock:
+            future = self.running.get(key)
+            if future is not None:
+                return future
+            for waiting in self.waiting:
+                if waiting[0] == key:
+                    return waiting[1]
+            future = Future()
+            if len(self.running) < self.max_running:
+                self._start(key, future, source, options)
+            elif len(self.waiting) < self.max_waiting:
+                self.waiting.append((key, future, source, options))
+            else:
+                raise Busy('%d compiles are waiting already' % len(self.waiting))
+        return future
+
+    def _start(self, key, future, source, options):
+        ## called with the lock held
+        self.running[key] = future
+        result = self.pool.apply_async(compile_request, (source, options),
+                                       callback=lambda response: self._done(key, future, response))
+        self.jobs[key] = result, time.time()
+
+    def _finish(self, key, future):
+        '''Free the slot of a running compile; False if it was freed already
+        (closed, or failed by `check`).'''
+        with self._lock:
+            if self.running.get(key) is not future:
+                return False
+            del self.running[key]
+            self.jobs.pop(key, None)
+            if self.waiting:
+                self._start(*self.waiting.popleft())
+        return True
+
+    def _done(self, key, future, response):
+        if not self._finish(key, future):
+            return
+        if 'error' in response:
+            future.set_exception(RemoteError(response['error'], response.get('kind')))
+            return
+        if cache.result_cache is not None:
+            cache.result_cache.set(key[0], response['css'])
+        future.set_result(response['css'])
+
+    def check(self):
+        '''Fail the compiles whose job failed in the pool or has run for
+        longer than `timeout`. A pool never calls back for a job it couldn't
+        send to a worker, or whose worker died.'''
+        now = time.time()
+        with self._lock:
+            jobs = [(key, self.running[key], result, started)
+                    for key, (result, started) in self.jobs.items()]
+        for key, future, result, started in jobs:
+            if result is not None and result.ready() and not result.successful():
+                error = Exception('the compile failed in the pool')
+                try:
+                    result.get(0)
+                except Exception, e:
+                    error = e
+            elif self.timeout is not None and now - started > self.timeout:
+                error = Timeout('the compile did not finish in %s seconds' % self.timeout)
+            else:
+                continue
+            if self._finish(key, future):
+                future.set_exception(error)
+
+    def _watch(self, interval):
+        while not self._closed.wait(interval):
+            self.check()
+
+    def close(self):
+        '''Stop the pool; compiles that haven't finished fail with Busy.'''
+        self._closed.set()
+        with self._lock:
+            futures = self.running.values() + [waiting[1] for waiting in self.waiting]
+            self.running, self.waiting = {}, collections.deque()
+            self.jobs = {}
+        for future in futures:
+            future.set_exception(Busy('the compiler was closed'))
+        if hasattr(self.pool, 'terminate'):
+            self.pool.terminate()
+
+_compiler = None
+_compiler_lock = threading.Lock()
+
+def configure(processes=None, max_running=None, max_waiting=100, pool=None, timeout=60):
+    '''Replace the compiler `convert` uses.'''
+    global _compiler
+    with _compiler_lock:
+        old, _compiler = _compiler, Compiler(processes, max_running, max_waiting, pool, timeout)
+    if old is not None:
+        old.close()
+
+def convert(source, variables={}, indent=2, fname=None, minified=False):
+    '''Compile in the background; returns a Future of the css.'''
+    global _compiler
+    with _compiler_lock:
+        if _compiler is None:
+            _compiler = Compiler()
+        compiler = _compiler
+    return compiler.convert(source, variables, indent, fname, minified)
+
+# vim: et sw=4 sts=4
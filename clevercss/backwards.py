@@ -2,12 +2,42 @@
 
 import cssutils
 import logging
+import mmap
+import re
 cssutils.log.setLevel(logging.FATAL)
 
-def parseCSS(text):
+## cleverfy hands the css to cssutils this many bytes at a time, cut at the
+## end of a top-level rule, so that a big file is never decoded and parsed
+## in one piece
+CHUNK = 1 << 16
+
+BOUNDARY = re.compile(r'/\*.*?\*/|"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|[{}]', re.S)
+
+def iter_chunks(data, size=CHUNK):
+    '''Split css (a string or a memory map) into pieces of at least `size`
+    bytes that end where a top-level rule does.'''
+    depth = 0
+    start = 0
+    for match in BOUNDARY.finditer(data):
+        token = match.group()
+        if token == '{':
+            depth += 1
+        elif token == '}':
+            depth = max(depth - 1, 0)
+            if not depth and match.end() - start >= size:
+                yield data[start:match.end()]
+                start = match.end()
+    if start < len(data):
+        yield data[start:]
+
+def parseCSS(text, rules=None):
+    '''Sort the rules of `text` into a tree of selector parts, adding to
+    `rules` if given. The leaves hold the declarations as text, so the
+    parsed stylesheet can be dropped.'''
     parser = cssutils.CSSParser()
     css = parser.parseString(text)
-    rules = {}
+    if rules is None:
+        rules = {}
     for rule in css.cssRules:
         commas = rule.selectorText.split(',')
         for comma in commas:
@@ -18,24 +48,50 @@ def parseCSS(text):
                     parts[i+1] = '&' + part + parts[i+1]
                     continue
                 c = c.setdefault(part, {})
-            c.setdefault(':rules:', []).append(rule)
+            c.setdefault(':rules:', []).append(rule.style.cssText)
     return rules
 
 def rulesToCCSS(selector, rules):
     text = selector + ':\n  '
     if rules.get(':rules:'):
-        text += '\n\n  '.join('\n  '.join(line.strip().rstrip(';') for line in rule.style.cssText.splitlines()) for rule in rules.get(':rules:', [])) + '\n'
+        text += '\n\n  '.join('\n  '.join(line.strip().rstrip(';') for line in style.splitlines()) for style in rules.get(':rules:', [])) + '\n'
     for other in rules:
         if other == ':rules:':
             continue
         text += '\n  ' + rulesToCCSS(other, rules[other]).replace('\n', '\n  ')
     return text
 
+def map_file(fp):
+    try:
+        return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    except (EnvironmentError, ValueError):
+        ## empty files can't be mapped
+        return fp.read()
+
+def parse_file(fname):
+    '''parseCSS for a file, which is memory mapped and parsed in chunks.'''
+    rules = {}
+    fp = open(fname, 'rb')
+    try:
+        data = map_file(fp)
+        try:
+            for chunk in iter_chunks(data):
+                parseCSS(chunk, rules)
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+    finally:
+        fp.close()
+    return rules
+
 def cleverfy(fname):
-    rules = parseCSS(open(fname).read())
-    text = ''
+    return ''.join(iter_cleverfy(fname))
+
+def iter_cleverfy(fname):
+    '''Convert a css file to CleverCSS, yielding it one top-level selector
+    at a time.'''
+    rules = parse_file(fname)
     for rule in rules:
-        text += rulesToCCSS(rule, rules[rule]) + '\n\n'
-    return text
+        yield rulesToCCSS(rule, rules[rule]) + '\n\n'
 
 # vim: et sw=4 sts=4
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+'''
+Time each stage of a conversion on synthetic stylesheets.
+
+    ccss bench [--rules N] [--depth N] [--repeat N] [-o results.json]
+               [--compare old.json]
+
+The stages are tokenizing (grammar.get_tokens), parsing
+(ccssgrammar.process), building the AST (to_ast), the line parser that
+replaces those three (lines.parse), constant folding and translating
+(CCSS.translate). Results are written as JSON, and comparing
+them against an earlier run exits non-zero when a stage got slower.
+'''
+
+from optparse import OptionParser
+import json
+import platform
+import sys
+import time
+
+from grammar import grammar as ccssgrammar
+from ctranslator import CCSS, new_scope
+import optimize
+import lines
+import cache
+
+STAGES = ('tokenize', 'process', 'to_ast', 'lines', 'fold', 'translate')
+
+def generate(rules=200, depth=3):
+    '''A stylesheet of `rules` top-level rules, each nesting `depth` deep,
+    using variables, arithmetic, colors and a mixin.'''
+    out = ['base = 12px', 'accent = #336699', 'ratio = 1.5', '',
+           '@box(width, pad=4px):', '    width: width', '    padding: pad pad * 2',
+           '    border: 1px solid accent.darken(10%)', '']
+    for i in xrange(rules):
+        for level in xrange(depth):
+            white = '    ' * level
+            out.append('%s.rule%d-%d a:hover, .other%d:' % (white, i, level, level))
+            out.append('%s    font-size: base * ratio + %dpx' % (white, i % 7))
+            out.append('%s    color: #%06x' % (white, (i * 2654435761) & 0xffffff))
+            out.append('%s    margin: %dpx auto' % (white, level))
+            if i % 5 == 0:
+                out.append('%s    @box(%dpx)' % (white, 100 + i))
+        out.append('')
+    return '\n'.join(out) + '\n'
+
+def timed(func, repeat):
+    '''Run `func` `repeat` times; return its last result and the timings.'''
+    times = []
+    for i in xrange(repeat):
+        start = time.time()
+        result = func()
+        times.append(time.time() - start)
+    return result, times
+
+def run(rules=200, depth=3, repeat=5):
+    '''Benchmark every stage on one generated stylesheet.'''
+    source = generate(rules, depth)
+    results = {}
+    def record(name, func):
+        result, times = timed(func, repeat)
+        results[name] = {'best': min(times) * 1000, 'mean': sum(times) / len(times) * 1000}
+        return result
+    record('tokenize', lambda: ccssgrammar.get_tokens(source))
+    parsed = record('process', lambda: ccssgrammar.process(source))
+    record('to_ast', lambda: ccssgrammar.to_ast(parsed))
+    ## the line parser does what the three stages above do; the first run
+    ## parses every expression, later ones mostly hit lines.expressions
+    lines.expressions.clear()
+    record('lines', lambda: lines.parse(source))
+    ## folding works in place, so every run needs a tree of its own
+    trees = [ccssgrammar.to_ast(parsed) for i in xrange(repeat)]
+    tree = record('fold', lambda: optimize.fold(trees.pop()))
+    record('translate', lambda: CCSS.translate(tree, new_scope(indent=2)))
+    return {
+        'version': __import__('clevercss').VERSION,
+        'grammar': cache.GRAMMAR_VERSION,
+        'python': platform.python_version(),
+        'rules': rules,
+        'depth': depth,
+        'repeat': repeat,
+        'bytes': len(source),
+        'lines': source.count('\n'),
+        'stages': results,
+    }
+
+def report(results, out=sys.stdout):
+    out.write('%(lines)d lines (%(bytes)d bytes), best of %(repeat)d\n' % results)
+    for name in STAGES:
+        out.write('  %-10s %10.2fms\n' % (name, results['stages'][name]['best']))
+
+def compare(old, new, tolerance, out=sys.stdout):
+    '''Print how each stage changed; return the stages that got slower than
+    `tolerance` allows.'''
+    slower = []
+    for name in STAGES:
+        if name not in old['stages']:
+            continue
+        before, after = old['stages'][name]['best'], new['stages'][name]['best']
+        ratio = after / before if before else 1.0
+        flag = ''
+        if ratio > 1 + tolerance:
+            slower.append(name)
+            flag = '  SLOWER'
+        out.write('  %-10s %10.2fms -> %8.2fms  (%+.0f%%)%s\n' % (name, before, after,
+                  (ratio - 1) * 100, flag))
+    return slower
+
+def main(argv=None):
+    parser = OptionParser(usage='%prog bench [options]')
+    parser.add_option('--rules', type='int', default=200,
+            help='number of top-level rules to generate (default 200)')
+    parser.add_option('--depth', type='int', default=3,
+            help='how deep each rule nests (default 3)')
+    parser.add_option('--repeat', type='int', default=5,
+            help='runs per stage; the best is reported (default 5)')
+    parser.add_option('-o', '--output', help='write the results as JSON to this file')
+    parser.add_option('--compare', help='compare against results from an earlier run')
+    parser.add_option('--tolerance', type='float', default=0.2,
+            help='allowed slowdown before --compare fails (default 0.2)')
+    options, args = parser.parse_args(argv)
+    if options.compare:
+        ## read it first, in case the output overwrites it
+        old = json.load(open(options.compare))
+    results = run(options.rules, options.depth, options.repeat)
+    report(results)
+    if options.output:
+        out = open(options.output, 'w')
+        try:
+            json.dump(results, out, indent=2, sort_keys=True)
+        finally:
+            out.close()
+    if options.compare:
+        print 'compared to %s:' % options.compare
+        if compare(old, results, options.tolerance):
+            return 1
+    return 0
+
+# vim: et sw=4 sts=4
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+'''
+Caches for parsed CleverCSS trees.
+
+Parsing is by far the most expensive part of a conversion, and an asset
+server tends to see the same stylesheet over and over again. `ASTCache` keys
+parse trees by a hash of the source text and of the grammar, and keeps them
+in a bounded in-memory LRU, optionally backed by a directory of marshalled
+trees so that they survive restarts. `ResultCache` does the same for the
+final CSS, keyed by the source, the variables and the output options.
+
+Swap the module level `ast_cache` and `result_cache` for differently sized
+ones (or `None` to disable that cache entirely)::
+
+    clevercss.cache.ast_cache = ASTCache(size=500, directory='/tmp/ccss')
+    clevercss.cache.result_cache = ResultCache(directory='/tmp/ccss-css')
+'''
+
+import os
+import marshal
+import hashlib
+import tempfile
+
+from codetalker.pgm.tokens import Token
+from lru import LRUCache
+from grammar import grammar as ccssgrammar
+from optimize import Constant, fold
+import optimize
+import ctranslator
+import grammar
+import values
+import consts
+import profiler as profiling
+import lines
+
+## the trees hold constants folded by optimize into values.Value objects,
+## so they depend on those modules as much as on the parser
+TREE_MODULES = (grammar, lines, optimize, values)
+
+def grammar_version(modules=TREE_MODULES):
+    '''A hash identifying the grammar, the line parser, the folding and the
+    value classes, so cached trees die with changes to any of them'''
+    digest = hashlib.sha1()
+    for module in modules:
+        fname = os.path.splitext(module.__file__)[0] + '.py'
+        try:
+            digest.update(open(fname).read())
+        except IOError:
+            digest.update(' '.join(sorted(vars(ccssgrammar.ast_classes))))
+    return digest.hexdigest()[:12]
+
+GRAMMAR_VERSION = grammar_version()
+
+## the css also changes with the translator and the constants it uses
+OUTPUT_MODULES = TREE_MODULES + (ctranslator, consts)
+OUTPUT_VERSION = grammar_version(OUTPUT_MODULES)
+
+def source_key(source):
+    if isinstance(source, unicode):
+        source = source.encode('utf8')
+    return hashlib.sha1(source).hexdigest() + '-' + GRAMMAR_VERSION
+
+class DiskCache(object):
+    '''Stores marshallable data as one file per key in a directory.'''
+    def __init__(self, directory):
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key, default=None):
+        try:
+            fp = open(self.path(key), 'rb')
+        except IOError:
+            return default
+        try:
+            try:
+                return marshal.load(fp)
+            except (EOFError, ValueError, TypeError):
+                return default
+        finally:
+            fp.close()
+
+    def set(self, key, value):
+        ## write to a temp file and rename, so readers never see half a file
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        fp = os.fdopen(fd, 'wb')
+        try:
+            marshal.dump(value, fp, 2)
+        finally:
+            fp.close()
+        os.rename(tmp, self.path(key))
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            os.remove(self.path(name))
+
+def dump_tree(node):
+    '''Convert an AST into nested tuples that marshal can store.'''
+    if node is None:
+        return None
+    elif isinstance(node, Token):
+        return ('t', node.__class__.__name__, node.value, node.lineno, node.charno)
+    elif type(node) in (list, tuple):
+        return ('l' if type(node) == list else 'T', tuple(dump_tree(item) for item in node))
+    elif isinstance(node, Constant):
+        if isinstance(node.value, values.Value):
+            return ('c', node.value.__class__.__name__, node.value.value)
+        return ('s', node.value)
+    attrs = tuple((name, dump_tree(getattr(node, name, None)))
+                  for name in node.__slots__ if name != '_tree')
+    return ('n', node.__class__.__name__, attrs)
+
+_token_classes = dict((tok.__name__, tok) for tok in ccssgrammar.tokens)
+
+def load_tree(data):
+    '''The inverse of `dump_tree`.'''
+    if data is None:
+        return None
+    kind = data[0]
+    if kind == 't':
+        return _token_classes[data[1]](*data[2:])
+    elif kind == 'l':
+        return [load_tree(item) for item in data[1]]
+    elif kind == 'T':
+        return tuple(load_tree(item) for item in data[1])
+    elif kind == 'c':
+        return Constant(getattr(values, data[1]).make(data[2]))
+    elif kind == 's':
+        return Constant(data[1])
+    node = getattr(ccssgrammar.ast_classes, data[1])()
+    node._tree = None
+    for name, value in data[2]:
+        setattr(node, name, load_tree(value))
+    return node
+
+def raw_parse(source, profiler=None):
+    '''Parse (and constant-fold) CleverCSS source, bypassing the cache.'''
+    phase = profiling.phases(profiler)
+    with phase('parse'):
+        tree = lines.parse(source)
+    with phase('fold'):
+        return fold(tree)
+
+class TieredCache(object):
+    '''An in-memory LRU optionally backed by a `DiskCache`.
+
+    Subclasses convert values to and from marshallable data with `dump` and
+    `load`.
+    '''
+    def __init__(self, size=100, directory=None):
+        self.memory = LRUCache(size)
+        self.disk = directory and DiskCache(directory) or None
+        self.hits = 0
+        self.misses = 0
+
+    def dump(self, value):
+        return value
+
+    def load(self, data):
+        return data
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            data = self.disk.get(key)
+            if data is not None:
+                value = self.load(data)
+                self.memory.set(key, value)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, self.dump(value))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.memory)}
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+        self.hits = self.misses = 0
+
+class ASTCache(TieredCache):
+    '''Parse trees keyed by source hash, in memory and optionally on disk.'''
+    dump = staticmethod(dump_tree)
+    load = staticmethod(load_tree)
+
+    def parse(self, source):
+        key = source_key(source)
+        tree = self.get(key)
+        if tree is None:
+            tree = raw_parse(source)
+            self.set(key, tree)
+        return tree
+
+class ResultCache(TieredCache):
+    '''Compiled CSS keyed by a fingerprint of everything that went into it.'''
+
+def result_key(version, source, variables, indent, minified):
+    '''Fingerprint the arguments of a `convert` call, and the code that
+    turns them into css.'''
+    if isinstance(source, unicode):
+        source = source.encode('utf8')
+    digest = hashlib.sha1(source)
+    digest.update(repr((version, OUTPUT_VERSION, sorted((variables or {}).items()), indent, bool(minified))))
+    return digest.hexdigest()
+
+ast_cache = ASTCache()
+result_cache = ResultCache(size=50)
+
+def parse(source):
+    '''Parse CleverCSS source into an AST, going through `ast_cache` if set.'''
+    if ast_cache is None:
+        return raw_parse(source)
+    return ast_cache.parse(source)
+
+# vim: et sw=4 sts=4
@@ -169,8 +169,21 @@ COLORS = {
 }
 REV_COLORS = dict((v, k) for k, v in COLORS.iteritems())
 
-CSS_VALUES = 'visible relative solid dotted dashed left right center none transparent block no-repeat absolute hidden visible fixed auto pointer normal bold break-word'.split(' ')
-CSS_FUNCTIONS = 'url rgb rgba'.split(' ')
+## colors packed into ints (0xrrggbb): the names to print them by, and the
+## shortest way to write each color that has a name or a three digit form
+COLOR_NAMES = dict((int(v[1:], 16), k) for v, k in REV_COLORS.iteritems())
+SHORTEST_COLORS = {}
+for _r in range(16):
+    for _g in range(16):
+        for _b in range(16):
+            SHORTEST_COLORS[_r * 0x110000 + _g * 0x1100 + _b * 0x11] = '#%x%x%x' % (_r, _g, _b)
+for _packed, _name in COLOR_NAMES.iteritems():
+    if len(_name) < len(SHORTEST_COLORS.get(_packed, '#000000')):
+        SHORTEST_COLORS[_packed] = _name
+del _r, _g, _b, _packed, _name
+
+CSS_VALUES = frozenset('visible relative solid dotted dashed left right center none transparent block no-repeat absolute hidden visible fixed auto pointer normal bold break-word'.split(' '))
+CSS_FUNCTIONS = frozenset('url rgb rgba'.split(' '))
 
 def css_func(name):
     def meta(*args):
@@ -1,110 +1,305 @@
 #!/usr/bin/env python
 
 from codetalker.pgm import Translator, tokens
-from errors import TranslateError
+from errors import TranslateError, ParseError
 from grammar import grammar as ccssgrammar, declare_args
 import grammar
 import operator
+import copy
+import warnings
 import values
 import consts
+from variables import Variables
+from lru import LRUCache
+import deps
+import lines
 
-ccssgrammar.load_rule(declare_args)
-
-CCSS = Translator(ccssgrammar, vbls=[consts.defaults.copy()], rule_stack=[], indent=4)
+CCSS = Translator(ccssgrammar, vbls=[consts.defaults.copy()], rule_stack=[], indent=4, minified=False, profiler=None)
 
 ast = ccssgrammar.ast_classes
 
+## warn when one rule expands to more selectors than this
+MAX_SELECTORS = 1000
+## how many distinct calls to remember per mixin
+MIXIN_CALLS = 128
+
+## parsed mixin signatures, keyed by the text of the argument list
+signatures = LRUCache(512)
+
+class Scope(object):
+    '''The state threaded through a translation.'''
+
+def new_scope(**args):
+    '''Build a scope the way CCSS.from_ast does, for translating piecemeal.'''
+    scope = Scope()
+    for name, value in copy.deepcopy(CCSS.defaults).iteritems():
+        setattr(scope, name, value)
+    for name, value in args.iteritems():
+        setattr(scope, name, value)
+    if not isinstance(scope.vbls, Variables):
+        scope.vbls = Variables(scope.vbls)
+    if getattr(scope, 'variables', None):
+        set_variables(scope, scope.variables)
+    return scope
+
+def set_variables(scope, variables):
+    '''Define variables passed in from outside in the top frame, where the
+    stylesheet's own assignments override them. Values that aren't
+    values.Value objects are parsed as expressions, like "10px" or "#333".'''
+    for name, value in variables.iteritems():
+        if not isinstance(value, values.Value):
+            if isinstance(value, unicode):
+                value = value.encode('utf8')
+            try:
+                tree = lines.expression(str(value), 1, 0, grammar.value)
+            except ParseError, e:
+                raise TranslateError('invalid value for variable %s: %s' % (name, e))
+            value = CCSS.translate(tree, scope)
+        scope.vbls.assign(name, value)
+
 def find_variable(name, scope):
-    for vbls in scope.vbls:
-        if name in vbls:
-            return vbls[name]
-    raise TranslateError('Undefined mixin %s' % name)
+    try:
+        return scope.vbls.lookup(name)
+    except KeyError:
+        raise TranslateError('Undefined mixin %s' % name)
+
+def handle_body(tree, scope, text, out):
+    '''Translate the body of a rule or mixin.
 
-def handle_body(tree, scope):
-    text, after = '', ''
+    Declarations are appended to the `text` list, nested rules straight to
+    `out`.
+    '''
     for node in tree.body:
-        if isinstance(node, ast.rule_def):
-            after += CCSS.translate(node, scope)
-        elif isinstance(node, ast.declare):
-            t, a = handle_declare(node, scope)
-            text += t
-            after += a
-        else:
-            text += CCSS.translate(node, scope)
-    return text, after
+        handle_item(node, scope, text, out)
+
+def handle_item(node, scope, text, out):
+    if isinstance(node, ast.rule_def):
+        emit_rule(node, scope, out)
+    elif isinstance(node, ast.declare):
+        handle_declare(node, scope, text, out)
+    else:
+        chunk = CCSS.translate(node, scope)
+        if chunk:
+            text.append(chunk)
+
+def emit(node, scope, out):
+    '''Translate a top-level statement, appending the css chunks to `out`.'''
+    if isinstance(node, ast.rule_def):
+        emit_rule(node, scope, out)
+    elif isinstance(node, ast.declare):
+        emit_declare(node, scope, out)
+    else:
+        chunk = CCSS.translate(node, scope)
+        if chunk:
+            out.append(chunk)
+
+def iter_css(tree, scope):
+    '''Yield the css for a parsed stylesheet chunk by chunk.'''
+    if not isinstance(scope.vbls, Variables):
+        ## a scope straight from CCSS.from_ast has a plain list of dicts
+        scope.vbls = Variables(scope.vbls)
+    for node in tree.body:
+        out = []
+        emit(node, scope, out)
+        for chunk in out:
+            yield chunk
 
 @CCSS.translates(ast.Start)
 def start(node, scope):
-    return ''.join(CCSS.translate(st, scope) for st in node.body)
+    return ''.join(iter_css(node, scope))
 
 @CCSS.translates(ast.Assign)
 def assign(node, scope):
-    scope.vbls[0][node.left.value] = CCSS.translate(node.value, scope)
+    scope.vbls.assign(node.left.value, CCSS.translate(node.value, scope))
     return ''
 
 @CCSS.translates(ast.Value)
 def value(node, scope):
-    return ' '.join(str(CCSS.translate(single, scope)) for single in node.values)
+    return ' '.join(css_text(CCSS.translate(single, scope), scope) for single in node.values)
 
 @CCSS.translates(ast.Declare)
 def declarer(node, scope):
-    text, after = handle_declare(node, scope)
-    return text + '\n' + after
+    out = []
+    emit_declare(node, scope, out)
+    return ''.join(out)
+
+def emit_declare(node, scope, out):
+    slot = len(out)
+    out.append('')
+    text = []
+    handle_declare(node, scope, text, out)
+    out[slot] = ''.join(text) + '\n'
+
+def handle_declare(node, scope, text, out):
+    mixin = find_variable(node.name.value, scope)
+    if not isinstance(mixin, Mixin):
+        raise TranslateError('%s is not a mixin' % node.name.value)
+    mixin.call(node, scope, text, out)
+
+def fingerprint(value):
+    if isinstance(value, values.Value):
+        return value.__class__, value.value
+    return value
+
+class Mixin(object):
+    '''A mixin definition, prepared once and then called many times.
 
-def handle_declare(node, scope):
-    args, tree = find_variable(node.name.value, scope)
-    scope.vbls.insert(0, {})
-    i = 0
-    for i, (arg, val) in enumerate(zip(args[0], node.args)):
-        scope.vbls[0][arg] = CCSS.translate(val, scope)
+    Attributes whose values are pure literals are rendered when the mixin is
+    defined. Calls are memoized on the argument values, on everything else
+    the body -- or the body of any mixin it calls -- could look up in the
+    caller's scope, and (if the body has nested rules) on the enclosing
+    selectors.
+    '''
+    def __init__(self, name, positional, defaults, node, scope):
+        self.name = name
+        self.positional = positional
+        self.defaults = defaults
+        self.node = node
+        self.free = sorted(deps.names_used(node) - set(positional))
+        self.callees = sorted(deps.mixins_called(node))
+        ## only output with nested rules depends on the enclosing selectors
+        self.nested = any(isinstance(item, (ast.rule_def, ast.declare)) for item in node.body)
+        self.body = [self.prerender(item, scope) for item in node.body]
+        self.calls = LRUCache(MIXIN_CALLS)
 
-    if i < len(args[0]) - len(args[1]) - 1:
-        raise TranslateError('mixin %s requires at least %d argument (%d given)' % (node.name.value,
-                                i, len(args[0]) - len(args[1])))
+    def prerender(self, node, scope):
+        if not isinstance(node, ast.Attribute):
+            return node
+        for token in deps.iter_tokens(node.value):
+            if isinstance(token, grammar.CSSID):
+                return node
+        try:
+            return CCSS.translate(node, scope)
+        except Exception:
+            ## leave it to fail at call time, as it always did
+            return node
 
-    for num in range(i+1, len(args[0])):
-        scope.vbls[0][args[0][num]] = args[1][args[0][num]]
+    def bind(self, node, scope):
+        args = [CCSS.translate(arg, scope) for arg in node.args]
+        bound = dict(zip(self.positional, args))
+        for name in self.positional[len(args):]:
+            if name not in self.defaults:
+                raise TranslateError('mixin %s requires at least %d argument (%d given)' % (self.name,
+                                len(self.positional) - len(self.defaults), len(args)))
+            bound[name] = self.defaults[name]
+        return bound
 
-    text, after = handle_body(tree, scope)
-    scope.vbls.pop(0)
-    return text, after
+    def key(self, bound, scope):
+        parts = [scope.indent, self.nested and scope.rule_stack and scope.rule_stack[-1]]
+        parts.extend(fingerprint(bound[name]) for name in self.positional)
+        for name in self.free_names(scope):
+            try:
+                parts.append(fingerprint(scope.vbls.lookup(name)))
+            except KeyError:
+                parts.append(None)
+        key = tuple(parts)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def free_names(self, scope):
+        '''self.free plus the free names of the mixins the body calls, as
+        they are bound in `scope`, transitively.'''
+        if not self.callees:
+            return self.free
+        names = set(self.free)
+        seen = set([self])
+        todo = [self]
+        while todo:
+            for name in todo.pop().callees:
+                try:
+                    mixin = scope.vbls.lookup(name)
+                except KeyError:
+                    continue
+                if isinstance(mixin, Mixin) and mixin not in seen:
+                    seen.add(mixin)
+                    names.update(mixin.free)
+                    todo.append(mixin)
+        return sorted(names)
+
+    def call(self, node, scope, text, out):
+        bound = self.bind(node, scope)
+        key = self.key(bound, scope)
+        cached = key is not None and self.calls.get(key)
+        if cached:
+            text.extend(cached[0])
+            out.extend(cached[1])
+            return
+        mine, after = [], []
+        scope.vbls.push(bound)
+        for item in self.body:
+            if isinstance(item, basestring):
+                mine.append(item)
+            else:
+                handle_item(item, scope, mine, after)
+        scope.vbls.pop()
+        if key is not None:
+            self.calls.set(key, (tuple(mine), tuple(after)))
+        text.extend(mine)
+        out.extend(after)
 
 @CCSS.translates(ast.Attribute)
 def attribute(node, scope):
-    return '%s: %s;\n' % (node.attr.value, CCSS.translate(node.value, scope))
+    return '%s: %s;\n' % (node.attr.value, css_text(CCSS.translate(node.value, scope), scope))
+
+def css_text(value, scope):
+    if isinstance(value, values.Value):
+        return value.css(scope is not None and scope.minified)
+    elif isinstance(value, basestring):
+        return value
+    return str(value)
 
 @CCSS.translates(ast.RuleDef)
 def rule_def(node, scope):
+    out = []
+    emit_rule(node, scope, out)
+    return ''.join(out)
+
+def emit_rule(node, scope, out):
     selector = node.selector.value[:-1].strip()
     if selector.startswith('@'):
-        args = declare_arguments(selector, scope)
-        scope.vbls[0][selector[1:].split('(')[0]] = args, node
-        return ''
-    scope.vbls.insert(0, {})
-    scope.rule_stack.append(selector)
+        positional, defaults = declare_arguments(selector, scope)
+        name = selector[1:].split('(')[0]
+        scope.vbls.assign(name, Mixin(name, positional, defaults, node, scope))
+        return
+    scope.vbls.push()
+    parents = scope.rule_stack and scope.rule_stack[-1] or ('',)
+    scope.rule_stack.append(expand_selector(parents, selector))
     selector = get_selector(scope)
-    text, after = handle_body(node, scope)
+    ## the rule's own declarations go before its nested rules, which are
+    ## written to `out` while the body is still being translated.
+    slot = len(out)
+    out.append('')
+    text = []
+    handle_body(node, scope, text, out)
     scope.rule_stack.pop()
-    scope.vbls.pop(0)
-    if not text.strip():
-        rule_text = ''
-    else:
-        rule_text = '%s {\n%s}\n' % (selector, indent(text, scope.indent))
-    return rule_text + after
+    scope.vbls.pop()
+    if any(chunk.strip() for chunk in text):
+        out[slot] = '%s {\n%s}\n' % (selector, ''.join(indent(chunk, scope.indent) for chunk in text))
 
 def get_selector(scope):
-    rules = ['']
-    for item in scope.rule_stack:
-        new = []
-        for parent in rules:
-            for child in item.split(','):
-                child = child.strip()
-                if '&' in child:
-                    new.append(child.replace('&', parent).strip())
-                else:
-                    new.append((parent + ' ' + child).strip())
-        rules = new
-    return ', '.join(rules)
+    return ', '.join(scope.rule_stack[-1])
+
+def expand_selector(parents, selector):
+    '''Combine the (already expanded) parent selectors with a child selector.
+
+    rule_stack holds the expanded selectors of every enclosing rule, so each
+    level only does the work for itself.
+    '''
+    children = [child.strip() for child in selector.split(',')]
+    if len(parents) * len(children) > MAX_SELECTORS:
+        warnings.warn('selector "%s" expands to %d selectors' % (selector,
+                            len(parents) * len(children)))
+    rules = []
+    for parent in parents:
+        for child in children:
+            if '&' in child:
+                rules.append(child.replace('&', parent).strip())
+            else:
+                rules.append((parent + ' ' + child).strip())
+    return tuple(rules)
 
 def declare_arguments(selector, scope):
     positional, default = [], {}
@@ -117,22 +312,41 @@ def declare_arguments(selector, scope):
         raise TranslateError('Invalid syntax for mixin declaration: "%s"' % selector)
     ## ^ to do this right, list line/column numbers... TODO
     text = '(' + selector.split('(', 1)[1]
-    tree = ccssgrammar.process(text, start=declare_args)
-    tree = ccssgrammar.to_ast(tree)
-    for arg in tree.args:
-        if arg.value:
-            default[arg.name.value] = CCSS.translate(arg.value, scope)
-        positional.append(arg.name.value)
-    return positional, default
+    positional, default_trees = parse_signature(text)
+    for name, tree in default_trees:
+        default[name] = CCSS.translate(tree, scope)
+    return list(positional), default
+
+def parse_signature(text):
+    '''Parse a mixin's "(a, b=expr)" into the argument names and the ASTs of
+    their default values. Each distinct text is only parsed once.'''
+    signature = signatures.get(text)
+    if signature is None:
+        tree = ccssgrammar.process(text, start=declare_args)
+        tree = ccssgrammar.to_ast(tree)
+        signature = (tuple(arg.name.value for arg in tree.args),
+                     tuple((arg.name.value, arg.value) for arg in tree.args if arg.value))
+        signatures.set(text, signature)
+    return signature
+
+OPERATORS = {'*': operator.mul, '/': operator.div, '+': operator.add, '-': operator.sub}
+
+## functions that evaluate to values, as opposed to consts.CSS_FUNCTIONS
+FUNCTIONS = {'palette': values.palette}
+
+## what every bare identifier that isn't a variable means, resolved up front
+IDENTIFIERS = dict((name, values.named_color(name)) for name in consts.COLORS)
+IDENTIFIERS.update(FUNCTIONS)
+IDENTIFIERS.update((name, consts.css_func(name)) for name in consts.CSS_FUNCTIONS)
+IDENTIFIERS.update((name, name) for name in consts.CSS_VALUES)
 
 @CCSS.translates(ast.BinOp)
 def BinOp(node, scope):
     result = CCSS.translate(node.left, scope)
-    operators = {'*': operator.mul, '/': operator.div, '+': operator.add, '-': operator.sub}
     for op, value in zip(node.ops, node.values):
         try:
             nv = CCSS.translate(value, scope)
-            result = operators[op.value](result, nv)
+            result = OPERATORS[op.value](result, nv)
         except TypeError:
             print [result, nv]
             raise
@@ -162,16 +376,14 @@ def atomic(node, scope):
 
 @CCSS.translates(grammar.CSSID)
 def literal(node, scope):
-    for dct in scope.vbls:
-        if node.value in dct:
-            return dct[node.value]
-    if node.value in consts.CSS_VALUES:
-        return node.value
-    elif node.value in consts.CSS_FUNCTIONS:
-        return consts.css_func(node.value)
-    elif node.value in consts.COLORS:
-        return values.Color(consts.COLORS[node.value])
-    raise ValueError('Undefined variable: %s' % node.value)
+    try:
+        return scope.vbls.lookup(node.value)
+    except KeyError:
+        pass
+    try:
+        return IDENTIFIERS[node.value]
+    except KeyError:
+        raise ValueError('Undefined variable: %s' % node.value)
 
 @CCSS.translates(tokens.STRING)
 def string(node, scope):
@@ -191,7 +403,7 @@ def value(node, scope):
     if len(node.values) > 1:
         res = []
         for value in node.values:
-            res.append(str(CCSS.translate(value, scope)))
+            res.append(css_text(CCSS.translate(value, scope), scope))
         return ' '.join(res)
     elif not node.values:
         print node._tree
@@ -200,11 +412,26 @@ def value(node, scope):
 
 @CCSS.translates(grammar.CSSCOLOR)
 def color(node, scope):
-    return values.Color(node.value)
+    return values.color(node.value)
 
 @CCSS.translates(grammar.CSSNUMBER)
 def number(node, scope):
-    return values.Number(node.value)
+    return values.number(node.value)
+
+## the pure-Python versions of what the extension replaces
+PURE = {ast.BinOp: CCSS.register[ast.BinOp], ast.Atomic: CCSS.register[ast.Atomic],
+        'indent': indent, 'get_selector': get_selector}
 
+## compiled versions of the hot translators, when the extension is built
+try:
+    import _speedups
+except ImportError:
+    _speedups = None
+else:
+    _speedups.install(CCSS, OPERATORS, ast, TranslateError)
+    CCSS.translates(ast.BinOp)(_speedups.binop)
+    CCSS.translates(ast.Atomic)(_speedups.atomic)
+    indent = _speedups.indent
+    get_selector = _speedups.get_selector
 
 # vim: et sw=4 sts=4
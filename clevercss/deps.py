@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+'''Find out which names a piece of CleverCSS defines and depends on.'''
+
+from codetalker.pgm.tokens import Token
+from codetalker.pgm.nodes import AstNode
+from grammar import grammar as ccssgrammar
+import grammar
+
+ast = ccssgrammar.ast_classes
+
+def iter_tokens(node):
+    '''Yield every token in an AST, depth first.'''
+    if node is None:
+        return
+    elif isinstance(node, Token):
+        yield node
+    elif type(node) in (list, tuple):
+        for item in node:
+            for token in iter_tokens(item):
+                yield token
+    elif isinstance(node, AstNode):
+        for name in node.__slots__:
+            if name != '_tree':
+                for token in iter_tokens(getattr(node, name, None)):
+                    yield token
+
+def names_used(node):
+    '''Every variable or mixin name that translating `node` could look up.
+
+    This is conservative: names that are assigned (or are just css keywords)
+    are included as well.
+    '''
+    names = set()
+    for token in iter_tokens(node):
+        if isinstance(token, grammar.CSSID):
+            names.add(token.value)
+        elif isinstance(token, grammar.CSSSELECTOR):
+            text = token.value.strip()
+            if text.startswith('@') and '(' in text:
+                ## default values of a mixin's arguments
+                names.update(grammar.CSSID.rx.findall(text.split('(', 1)[1]))
+    return names
+
+def mixins_called(node):
+    '''The names of the mixins a rule or mixin body calls, at any depth.'''
+    names = set()
+    for item in node.body:
+        if isinstance(item, ast.Declare):
+            names.add(item.name.value)
+        elif isinstance(item, ast.RuleDef):
+            names.update(mixins_called(item))
+    return names
+
+def mixin_name(selector):
+    '''The name a mixin definition binds, or None for a normal rule.'''
+    selector = selector.strip()
+    if selector.startswith('@'):
+        return selector[1:].split('(')[0].rstrip(':').strip()
+    return None
+
+def names_defined(node):
+    '''The names that the top-level statements of `node` bind.'''
+    names = []
+    for statement in node.body:
+        if isinstance(statement, ast.Assign):
+            names.append(statement.left.value)
+        elif isinstance(statement, ast.RuleDef):
+            name = mixin_name(statement.selector.value)
+            if name is not None:
+                names.append(name)
+    return names
+
+def dependency_graph(tree):
+    '''Map every name to the top-level names whose definitions use it:
+    changing a variable changes what those assignments and mixins bind.'''
+    graph = {}
+    for statement in tree.body:
+        if isinstance(statement, ast.Assign):
+            name, used = statement.left.value, names_used(statement.value)
+        elif isinstance(statement, ast.RuleDef) and mixin_name(statement.selector.value):
+            name, used = mixin_name(statement.selector.value), names_used(statement)
+        else:
+            continue
+        for dependency in used:
+            graph.setdefault(dependency, set()).add(name)
+    return graph
+
+def affected(graph, names):
+    '''`names` and every name that depends on one of them, transitively.'''
+    found = set(names)
+    todo = list(found)
+    while todo:
+        for name in graph.get(todo.pop(), ()):
+            if name not in found:
+                found.add(name)
+                todo.append(name)
+    return found
+
+# vim: et sw=4 sts=4
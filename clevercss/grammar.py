@@ -28,7 +28,7 @@ class CSSCOLOR(ReToken):
     rx = re.compile(r'#(?:[0-9a-fA-F]{6}|[0-9a-fA-F]{3})')
 
 class SYMBOL(StringToken):
-    items = tuple('+-*/@(),=:.')
+    items = tuple('+-*/@(),=:.[]')
 
 def start(rule):
     rule | (star(_or(statement, NEWLINE)))
@@ -108,6 +108,16 @@ def arg(rule):
     rule.astAttrs = {'name':{'type':CSSID, 'single':True},
                      'value':{'type':expression, 'optional':True, 'single':True}}
 
-grammar = Grammar(start=start, indent=True, tokens=[CSSSELECTOR, STRING, CSSID, CSSNUMBER, CSSCOLOR, CCOMMENT, SYMBOL, NEWLINE, WHITE], ignore=[WHITE, CCOMMENT], ast_tokens=[CSSID, CSSCOLOR, STRING, CSSNUMBER])
+def build():
+    grammar = Grammar(start=start, indent=True, tokens=[CSSSELECTOR, STRING, CSSID, CSSNUMBER, CSSCOLOR, CCOMMENT, SYMBOL, NEWLINE, WHITE], ignore=[WHITE, CCOMMENT], ast_tokens=[CSSID, CSSCOLOR, STRING, CSSNUMBER])
+    ## mixin definitions are parsed on their own, with this as the start rule
+    grammar.load_rule(declare_args)
+    return grammar
+
+## the precompiled tables (see grammar_table.py) skip the building
+import grammar_table
+grammar = grammar_table.load(globals())
+if grammar is None:
+    grammar = build()
 
 # vim: et sw=4 sts=4
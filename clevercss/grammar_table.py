@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+'''
+The compiled grammar, stored in a file next to grammar.py.
+
+Building the grammar runs every rule function through CodeTalker and
+creates the AST classes, in every process that imports it. `write` stores
+the result of all that -- the rule tables, the token tables and the AST
+class layout -- as marshalled data in `TABLE`, and grammar.py `load`s it
+instead when it is there and was made from the same grammar.py and the
+same CodeTalker, compiled extension included. Otherwise, or if loading it
+fails in any way, the grammar is built as before, so the table is only
+ever a shortcut:
+
+    python setup.py build_grammar
+    python -m clevercss.grammar_table [path]
+'''
+
+import os
+import sys
+import marshal
+import hashlib
+
+TABLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'grammar.table')
+
+def version(namespace):
+    '''A hash of grammar.py, of this module, of CodeTalker's grammar module
+    and of its compiled cgrammar, which reads the tables; None if one of
+    them can't be read.'''
+    from codetalker.pgm import grammar as codetalker_grammar
+    from codetalker import cgrammar
+    files = [os.path.splitext(module)[0] + '.py' for module in
+             (namespace['__file__'], __file__, codetalker_grammar.__file__)]
+    digest = hashlib.sha1()
+    try:
+        for fname in files:
+            digest.update(open(fname, 'rb').read())
+        ## the extension is too big to hash on every import; reinstalling it
+        ## only makes the table look out of date
+        stat = os.stat(cgrammar.__file__)
+    except (IOError, OSError):
+        return None
+    digest.update(repr((stat.st_size, stat.st_mtime)))
+    return digest.hexdigest()
+
+def load(namespace, path=TABLE):
+    '''The grammar stored in `path` for the grammar module whose globals are
+    `namespace`; None if there is no table or it is out of date.'''
+    try:
+        fp = open(path, 'rb')
+    except IOError:
+        return None
+    try:
+        try:
+            stored, data = marshal.load(fp)
+        except (EOFError, ValueError, TypeError):
+            return None
+    finally:
+        fp.close()
+    if stored != version(namespace):
+        return None
+    try:
+        return Loader(namespace).grammar(data)
+    except Exception:
+        ## whatever is wrong with it, building the grammar still works
+        return None
+
+def write(path=TABLE):
+    '''Build the grammar and store it in `path`.'''
+    import grammar
+    namespace = vars(grammar)
+    data = (version(namespace), Dumper(namespace).grammar(grammar.build()))
+    tmp = path + '.tmp'
+    fp = open(tmp, 'wb')
+    try:
+        marshal.dump(data, fp, 2)
+    finally:
+        fp.close()
+    os.rename(tmp, path)
+
+## Scalars are stored as they are and every other value as a tuple tagged
+## with its kind: 'v'alue that marshal stores as it is (the rule options and
+## most of the rest), 'l'ist, 'T'uple, 'd'ict, 'n'ame in the grammar module,
+## 'm'odule level name elsewhere, 'a'st class, 'r'ule, and the 'g'rammar
+## itself, which rules point back at. Rules and the dicts of AST attributes
+## are shared between several of the grammar's tables, so every list, dict
+## and rule is stored once and then referred to as 'R' and its number.
+
+SCALARS = (type(None), bool, int, long, float, str, unicode)
+
+def plain(value):
+    if type(value) in (list, tuple):
+        return all(plain(item) for item in value)
+    elif type(value) == dict:
+        return all(plain(key) and plain(item) for key, item in value.iteritems())
+    return isinstance(value, SCALARS)
+
+class Dumper(object):
+    def __init__(self, namespace):
+        self.namespace = namespace
+
+    def grammar(self, grammar):
+        self.current = grammar
+        self.classes = {}
+        self.shared = {}
+        attrs = tuple((name, self.dump(value)) for name, value in sorted(vars(grammar).items())
+                      if name not in ('GID', 'ast_classes'))
+        return (self.ref(grammar.__class__), self.ast_classes(grammar.ast_classes), attrs)
+
+    def ast_classes(self, holder):
+        '''The AST classes, each once, and the names they go by.'''
+        classes = []
+        names = []
+        for name, cls in sorted(vars(holder).items()):
+            if not isinstance(cls, type) or name.startswith('__'):
+                continue
+            if cls not in self.classes:
+                self.classes[cls] = len(classes)
+                classes.append((cls.__name__, self.ref(cls.__bases__[0]), cls.__slots__,
+                                cls.__module__))
+            names.append((name, self.classes[cls]))
+        return holder.__name__, tuple(classes), tuple(names)
+
+    def dump(self, value):
+        if isinstance(value, SCALARS):
+            return value
+        elif plain(value):
+            return ('v', value)
+        elif type(value) == tuple:
+            return ('T', tuple(self.dump(item) for item in value))
+        elif value is self.current:
+            return ('g',)
+        elif isinstance(value, type) and value in self.classes:
+            return ('a', self.classes[value])
+        elif id(value) in self.shared:
+            return ('R', self.shared[id(value)])
+        elif type(value) == list:
+            self.share(value)
+            return ('l', tuple(self.dump(item) for item in value))
+        elif type(value) == dict:
+            self.share(value)
+            return ('d', tuple((self.dump(key), self.dump(item)) for key, item in value.iteritems()))
+        elif hasattr(value, '__slots__') and not isinstance(value, type):
+            self.share(value)
+            return ('r', self.ref(value.__class__),
+                    tuple((name, self.dump(getattr(value, name))) for name in value.__slots__
+                          if hasattr(value, name)))
+        return self.ref(value)
+
+    def share(self, value):
+        ## the loader numbers them in the same order, as it meets them
+        self.shared[id(value)] = len(self.shared)
+
+    def ref(self, obj):
+        '''A function or class, by name.'''
+        name = getattr(obj, '__name__', None)
+        if name is not None and self.namespace.get(name) is obj:
+            return ('n', name)
+        module = sys.modules.get(getattr(obj, '__module__', None))
+        if name is None or getattr(module, name, None) is not obj:
+            raise ValueError('cannot store %r in the grammar table' % (obj,))
+        return ('m', module.__name__, name)
+
+class Loader(object):
+    def __init__(self, namespace):
+        self.namespace = namespace
+
+    def grammar(self, (cls, ast_classes, attrs)):
+        from codetalker.cgrammar import consume_grammar
+        cls = self.load(cls)
+        if isinstance(cls, type):
+            grammar = cls.__new__(cls)
+        else:
+            import types
+            grammar = types.InstanceType(cls)
+        self.current = grammar
+        self.shared = []
+        grammar.ast_classes = self.ast_classes(ast_classes)
+        for name, value in attrs:
+            setattr(grammar, name, self.load(value))
+        ## what Grammar.__init__ does last
+        grammar.GID = consume_grammar(grammar.rules, grammar.ignore, grammar.indent,
+                                      grammar.idchars, grammar.rule_names, grammar.rule_dict,
+                                      grammar.tokens, grammar.ast_attrs)
+        return grammar
+
+    def ast_classes(self, (holder, classes, names)):
+        self.classes = [type(name, (self.load(base),), {'__slots__': slots, '__module__': module})
+                        for name, base, slots, module in classes]
+        return type(holder, (), dict((name, self.classes[i]) for name, i in names))
+
+    def load(self, value):
+        if type(value) != tuple:
+            return value
+        kind = value[0]
+        if kind == 'v':
+            return value[1]
+        elif kind == 'T':
+            return tuple(self.load(item) for item in value[1])
+        elif kind == 'R':
+            return self.shared[value[1]]
+        elif kind == 'l':
+            items = []
+            self.shared.append(items)
+            items.extend(self.load(item) for item in value[1])
+            return items
+        elif kind == 'd':
+            items = {}
+            self.shared.append(items)
+            for key, item in value[1]:
+                items[self.load(key)] = self.load(item)
+            return items
+        elif kind == 'n':
+            return self.namespace[value[1]]
+        elif kind == 'm':
+            if value[1] not in sys.modules:
+                __import__(value[1])
+            return getattr(sys.modules[value[1]], value[2])
+        elif kind == 'a':
+            return self.classes[value[1]]
+        elif kind == 'g':
+            return self.current
+        elif kind == 'r':
+            cls = self.load(value[1])
+            node = cls.__new__(cls)
+            self.shared.append(node)
+            for name, item in value[2]:
+                setattr(node, name, self.load(item))
+            return node
+        raise ValueError('invalid grammar table entry: %r' % (value,))
+
+if __name__ == '__main__':
+    write(*sys.argv[1:])
+    print 'wrote %s' % (sys.argv[1:] or [TABLE])[0]
+
+# vim: et sw=4 sts=4
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+'''
+Incremental recompilation of a changing stylesheet.
+
+The source is split at its top-level statements. Each block remembers the
+css it produced last time, together with its text and the bindings of every
+top-level name it uses. On the next `compile` only blocks whose text or
+whose dependencies changed are parsed and translated again; everything else
+is spliced in from the previous output. Assignments and mixin definitions
+are always re-run (they are cheap, and they build the scope everybody else
+translates in).
+'''
+
+import hashlib
+
+from ctranslator import CCSS, new_scope
+from cache import raw_parse
+import deps
+import lines
+
+def split_blocks(source):
+    '''Split CleverCSS source into the text of its top-level statements.
+
+    A statement starts where lines.parse would see one: at a line that
+    isn't indented once its comment is stripped. Blank and comment-only
+    lines belong to the block they are in.
+    '''
+    blocks = []
+    current = []
+    statement = False
+    in_comment = False
+    for line in source.splitlines(True):
+        text = lines.strip_comment(line).rstrip()
+        if text and not in_comment:
+            if text[:1] not in ' \t' and statement:
+                blocks.append(''.join(current))
+                current = []
+            statement = True
+        current.append(line)
+        if '/*' in line and '*/' not in line.split('/*')[-1]:
+            in_comment = True
+        elif in_comment and '*/' in line:
+            in_comment = False
+    if current:
+        blocks.append(''.join(current))
+    return blocks
+
+class Block(object):
+    __slots__ = ('text', 'tree', 'uses', 'defines')
+
+    def __init__(self, text):
+        self.text = text
+        self.tree = raw_parse(text)
+        self.uses = sorted(deps.names_used(self.tree))
+        self.defines = deps.names_defined(self.tree)
+
+class IncrementalCompiler(object):
+    '''Recompile a stylesheet, re-translating only the parts that changed.
+
+        compiler = IncrementalCompiler(indent=2)
+        css = compiler.compile(source)
+        ...
+        css = compiler.compile(edited_source)
+    '''
+    def __init__(self, indent=2, fname=None, minified=False):
+        self.options = dict(indent=indent, fname=fname, minified=minified, variables={})
+        self.blocks = {}
+        self.outputs = {}
+        self.translated = 0
+        self.reused = 0
+
+    def compile(self, source):
+        scope = new_scope(**self.options)
+        bindings = {}
+        blocks, outputs, css = {}, {}, []
+        self.translated = self.reused = 0
+        for text in split_blocks(source):
+            block = self.blocks.get(text) or blocks.get(text) or Block(text)
+            blocks[text] = block
+            key = hashlib.sha1(repr((text, [bindings.get(name) for name in block.uses]))).digest()
+            if block.defines or key not in self.outputs:
+                output = CCSS.translate(block.tree, scope)
+                self.translated += 1
+            else:
+                output = self.outputs[key]
+                self.reused += 1
+            for name in block.defines:
+                bindings[name] = key
+            outputs[key] = output
+            css.append(output)
+        self.blocks, self.outputs = blocks, outputs
+        return ''.join(css)
+
+# vim: et sw=4 sts=4
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+'''
+A line-oriented front end for the parser.
+
+Every CleverCSS statement is exactly one line, so `parse` doesn't run the
+CodeTalker tokenizer over the whole file -- where the catch-all CSSSELECTOR
+regex is tried at every position and scans to the end of the line each
+time. Instead it classifies each line once, by its indentation and shape,
+as a selector, assignment, attribute or mixin call, and builds the
+statement nodes itself. Only the expressions go through CodeTalker, and
+each distinct expression text only once.
+
+The tree is the same one `ccssgrammar.to_ast(ccssgrammar.process(source))`
+gives, except that the positions of tokens inside an expression are
+relative to the start of that expression.
+'''
+
+import mmap
+import re
+
+from codetalker.pgm.errors import ParseError, TokenError
+from grammar import grammar as ccssgrammar
+from lru import LRUCache
+import grammar
+
+ast = ccssgrammar.ast_classes
+
+## parsed expressions by text. The trees are shared by every line with the
+## same text, so nothing may change them in place (optimize.fold doesn't).
+expressions = LRUCache(4096)
+
+STATEMENT = re.compile(r'(-?[a-zA-Z_][a-zA-Z0-9_-]*)[ \t]*([=:])[ \t]*(.*)$')
+
+def parse(source):
+    '''Parse CleverCSS source into an AST.'''
+    top = ast.Start()
+    top._tree = None
+    top.body = list(iter_statements(source))
+    return top
+
+def iter_statements(source):
+    '''Parse CleverCSS source, yielding each top-level statement as soon as
+    the line after it shows that it is complete.
+
+    `source` is a string or an iterable of lines, like a file or
+    `read_lines`, so a stylesheet can be parsed (and translated) without
+    ever holding all of it.
+    '''
+    top = []
+    ## (indentation, body, owner) of each open block, innermost last
+    blocks = [(0, top, None)]
+    pending = None
+    lineno = 0
+    for lineno, line in enumerate(iter_lines(source), 1):
+        line = strip_comment(line).rstrip()
+        text = line.lstrip()
+        if not text:
+            continue
+        column = len(line) - len(text)
+        if pending is not None:
+            if column <= blocks[-1][0]:
+                raise ParseError('expected an indented block after "%s"' %
+                                 pending.selector.value, lineno, column + 1)
+            blocks.append((column, pending.body, pending))
+            pending = None
+        else:
+            while column < blocks[-1][0]:
+                blocks.pop()
+            if column != blocks[-1][0]:
+                raise ParseError('unexpected indent', lineno, column + 1)
+        node = parse_line(line, text, lineno, column, blocks[-1][2] is not None)
+        if top and len(blocks) == 1:
+            yield top.pop()
+        blocks[-1][1].append(node)
+        if isinstance(node, ast.RuleDef):
+            pending = node
+    if pending is not None:
+        raise ParseError('expected an indented block after "%s"' %
+                         pending.selector.value, lineno + 1, 1)
+    if top:
+        yield top.pop()
+
+def iter_lines(source):
+    if isinstance(source, basestring):
+        return source.splitlines()
+    ## split what a file calls a line the way str.splitlines would
+    return (line for chunk in source for line in chunk.splitlines())
+
+def read_lines(fp):
+    '''Yield the lines of an open file from a memory map of it, so that they
+    are paged in from the file as they are read instead of being copied into
+    one string. Files that can't be mapped (pipes, empty files) are read
+    line by line.'''
+    try:
+        data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, EnvironmentError, ValueError):
+        for line in fp:
+            yield line
+        return
+    try:
+        line = data.readline()
+        while line:
+            yield line
+            line = data.readline()
+    finally:
+        data.close()
+
+def parse_line(line, text, lineno, column, nested):
+    '''Build the statement node for a line; `text` is the line without its
+    indentation.'''
+    if text.endswith(':'):
+        ## like the CSSSELECTOR token, this keeps the indentation
+        return make(ast.RuleDef, selector=grammar.CSSSELECTOR(line, lineno, 1), body=[])
+    elif text.startswith('@'):
+        ## folding sets the arguments of a declare, so it gets its own node
+        return copy(expression(text, lineno, column, grammar.declare))
+    match = STATEMENT.match(text)
+    if match is None or not match.group(3) or (match.group(2) == ':' and not nested):
+        raise ParseError('invalid statement "%s"' % text, lineno, column + 1)
+    name, kind, rest = match.groups()
+    value = expression(rest, lineno, column + match.start(3), grammar.value)
+    left = grammar.CSSID(name, lineno, column + 1)
+    if kind == '=':
+        return make(ast.Assign, left=left, value=value)
+    return make(ast.Attribute, attr=left, value=value)
+
+def expression(text, lineno, column, start):
+    '''Parse `text` with the `start` rule, going through `expressions`.'''
+    key = (text, start.__name__)
+    tree = expressions.get(key)
+    if tree is None:
+        try:
+            tree = ccssgrammar.to_ast(ccssgrammar.process(text, start=start))
+        except (ParseError, TokenError), e:
+            message = str(e).rsplit(' at (', 1)[0]
+            raise ParseError(message, lineno + e.lineno - 1, column + e.charno)
+        expressions.set(key, tree)
+    return tree
+
+def copy(node):
+    new = node.__class__.__new__(node.__class__)
+    for name in node.__slots__:
+        setattr(new, name, getattr(node, name, None))
+    return new
+
+def make(cls, **attrs):
+    node = cls()
+    node._tree = None
+    for name, value in attrs.iteritems():
+        setattr(node, name, value)
+    return node
+
+def strip_comment(line):
+    '''Cut a line at a // comment that isn't inside a string.'''
+    if '//' not in line:
+        return line
+    quote = None
+    i = 0
+    while i < len(line):
+        char = line[i]
+        if quote:
+            if char == '\\':
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif line.startswith('//', i):
+            return line[:i]
+        i += 1
+    return line
+
+# vim: et sw=4 sts=4
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+'''
+Constant folding over the CleverCSS AST.
+
+`fold` replaces every expression that can only ever translate to one value
+by a `Constant` holding that value, so translating the (cached) tree again
+skips the arithmetic. Literal numbers, colors and strings are constant, and
+so are references to variables that are assigned exactly once in the whole
+stylesheet, at the top level, to a constant -- but only in statements that
+come after the assignment.
+
+Evaluation goes through the normal translators. Anything that fails to
+evaluate is left alone, to fail at translation time as it always did.
+'''
+
+from codetalker.pgm import tokens
+from ctranslator import CCSS, ast
+import grammar
+import values
+import deps
+
+class Constant(object):
+    '''An expression folded into the value it always translates to.'''
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        return '<Constant %r>' % (self.value,)
+
+@CCSS.translates(Constant)
+def constant(node, scope):
+    return node.value
+
+LITERALS = (grammar.CSSNUMBER, grammar.CSSCOLOR, tokens.STRING)
+
+def fold(tree):
+    '''Fold the constant expressions of a parsed stylesheet, in place.'''
+    counts = assignment_counts(tree)
+    known = {}
+    for statement in tree.body:
+        fold_statement(statement, known)
+        if isinstance(statement, ast.Assign):
+            name = statement.left.value
+            if counts.get(name) == 1 and isinstance(statement.value, Constant):
+                known[name] = statement.value.value
+    return tree
+
+def assignment_counts(tree):
+    '''How often each name is bound anywhere, counting mixin parameters twice
+    so that they are never folded.'''
+    counts = {}
+    def visit(body):
+        for node in body:
+            if isinstance(node, ast.Assign):
+                counts[node.left.value] = counts.get(node.left.value, 0) + 1
+            elif isinstance(node, ast.RuleDef):
+                selector = node.selector.value.strip()
+                name = deps.mixin_name(selector)
+                if name is not None:
+                    counts[name] = counts.get(name, 0) + 1
+                if selector.startswith('@') and '(' in selector:
+                    for name in grammar.CSSID.rx.findall(selector.split('(', 1)[1]):
+                        counts[name] = counts.get(name, 0) + 2
+                visit(node.body)
+    visit(tree.body)
+    return counts
+
+def fold_statement(node, known):
+    if isinstance(node, (ast.Assign, ast.Attribute)):
+        node.value = fold_expression(node.value, known)
+    elif isinstance(node, ast.Declare):
+        node.args = fold_sequence(node.args, known)
+    elif isinstance(node, ast.RuleDef):
+        for item in node.body:
+            fold_statement(item, known)
+
+def fold_sequence(items, known):
+    return unchanged(type(items)(fold_expression(item, known) for item in items), items)
+
+def fold_post(post, known):
+    if isinstance(post, ast.post_subs):
+        return replace(post, subscript=fold_expression(post.subscript, known))
+    elif isinstance(post, ast.post_call):
+        return replace(post, args=fold_sequence(post.args, known))
+    return post
+
+def unchanged(new, old):
+    '''`old` if the sequence `new` holds the same items, else `new`.'''
+    if len(new) == len(old) and all(a is b for a, b in zip(new, old)):
+        return old
+    return new
+
+## Expressions are never changed in place: the line parser shares the tree
+## of an expression between every line with the same text.
+def fold_expression(node, known):
+    if isinstance(node, LITERALS):
+        return evaluate(node)
+    elif isinstance(node, grammar.CSSID):
+        if node.value in known:
+            return Constant(known[node.value])
+        return node
+    elif isinstance(node, ast.BinOp):
+        node = replace(node, left=fold_expression(node.left, known),
+                       values=fold_sequence(node.values, known))
+        parts = [node.left] + list(node.values)
+    elif isinstance(node, ast.Value):
+        node = replace(node, values=fold_sequence(node.values, known))
+        parts = list(node.values)
+        if len(parts) > 1 and any(isinstance(part, Constant) and
+                isinstance(part.value, (values.Color, values.ColorArray)) for part in parts):
+            ## joined up, colors would be spelled the same whether or not
+            ## the output is minified
+            return node
+    elif isinstance(node, ast.Atomic):
+        posts = unchanged([fold_post(post, known) for post in node.posts], node.posts)
+        node = replace(node, literal=fold_expression(node.literal, known), posts=posts)
+        parts = [node.literal]
+        for post in node.posts:
+            if isinstance(post, ast.post_subs):
+                parts.append(post.subscript)
+            elif isinstance(post, ast.post_call):
+                parts.extend(post.args)
+    else:
+        return node
+    if all(isinstance(part, Constant) for part in parts):
+        return evaluate(node)
+    return node
+
+def replace(node, **attrs):
+    '''`node`, or a copy of it if any of `attrs` differ.'''
+    if all(getattr(node, name) is value for name, value in attrs.iteritems()):
+        return node
+    new = node.__class__.__new__(node.__class__)
+    for name in node.__slots__:
+        setattr(new, name, attrs.get(name, getattr(node, name, None)))
+    return new
+
+def evaluate(node):
+    try:
+        value = CCSS.translate(node, None)
+    except Exception:
+        return node
+    if not isinstance(value, (values.Value, basestring)):
+        return node
+    return Constant(value)
+
+# vim: et sw=4 sts=4
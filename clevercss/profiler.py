@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+'''
+Where the time of a conversion goes.
+
+Pass a `Profiler` to `clevercss.convert` to record the wall time and call
+count of each phase (parsing, building the AST, folding, translating) and of
+the translation of each type of AST node:
+
+    profiler = Profiler()
+    clevercss.convert(source, profiler=profiler)
+    profiler.report()
+
+Node times are "self" times, without the nodes translated inside them, so
+they add up to the translate phase. Timing nodes means wrapping
+`CCSS.translate` and the rule and mixin emitters, which is only done while
+some profiler is active.
+'''
+
+import sys
+import threading
+import time
+
+import ctranslator
+
+class Profiler(object):
+    '''Collects timings; `callback`, if given, is called with
+    (kind, name, seconds) for every one recorded.'''
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.phases = {}
+        self.nodes = {}
+        self._inner = []
+
+    def phase(self, name):
+        return Phase(self, name)
+
+    def translating(self):
+        '''Time the translate phase, and the nodes in it.'''
+        return Phase(self, 'translate', traced=True)
+
+    def add(self, table, kind, name, seconds):
+        entry = table.get(name)
+        if entry is None:
+            entry = table[name] = [0.0, 0]
+        entry[0] += seconds
+        entry[1] += 1
+        if self.callback is not None:
+            self.callback(kind, name, seconds)
+
+    def time_node(self, node, func, scope, args):
+        self._inner.append(0.0)
+        start = time.time()
+        try:
+            return func(node, scope, *args)
+        finally:
+            elapsed = time.time() - start
+            inner = self._inner.pop()
+            if self._inner:
+                self._inner[-1] += elapsed
+            self.add(self.nodes, 'node', node.__class__.__name__, elapsed - inner)
+
+    def as_dict(self):
+        return {
+            'phases': dict((name, {'seconds': t, 'calls': n}) for name, (t, n) in self.phases.iteritems()),
+            'nodes': dict((name, {'seconds': t, 'calls': n}) for name, (t, n) in self.nodes.iteritems()),
+        }
+
+    def report(self, out=sys.stdout):
+        '''Print the phases and node types, slowest first.'''
+        for title, table in (('phase', self.phases), ('node type', self.nodes)):
+            out.write('%-20s %10s %8s\n' % (title, 'ms', 'calls'))
+            for name, (seconds, calls) in sorted(table.iteritems(), key=lambda item: -item[1][0]):
+                out.write('  %-18s %10.2f %8d\n' % (name, seconds * 1000, calls))
+
+class Phase(object):
+    def __init__(self, profiler, name, traced=False):
+        self.profiler = profiler
+        self.name = name
+        self.traced = traced
+
+    def __enter__(self):
+        if self.traced:
+            install()
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.profiler.phases, 'phase', self.name, time.time() - self.start)
+        if self.traced:
+            uninstall()
+
+class NoPhase(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+_no_phase = NoPhase()
+
+def phases(profiler):
+    '''`profiler.phase`, or a stand-in that times nothing if it is None.'''
+    if profiler is None:
+        return lambda name: _no_phase
+    return profiler.phase
+
+## the functions that are wrapped while profiling
+TRACED = ('emit_rule', 'emit_declare', 'handle_declare')
+
+_lock = threading.Lock()
+_active = [0]
+_originals = {}
+
+def traced(func):
+    def meta(node, scope, *args):
+        profiler = getattr(scope, 'profiler', None)
+        if profiler is None:
+            return func(node, scope, *args)
+        return profiler.time_node(node, func, scope, args)
+    meta.__name__ = func.__name__
+    return meta
+
+def install():
+    '''Start timing nodes for the scopes that have a profiler.'''
+    with _lock:
+        if not _active[0]:
+            _originals['translate'] = ctranslator.CCSS.translate
+            ctranslator.CCSS.translate = traced(ctranslator.CCSS.translate)
+            for name in TRACED:
+                _originals[name] = getattr(ctranslator, name)
+                setattr(ctranslator, name, traced(_originals[name]))
+        _active[0] += 1
+
+def uninstall():
+    with _lock:
+        _active[0] -= 1
+        if not _active[0]:
+            ctranslator.CCSS.translate = _originals['translate']
+            for name in TRACED:
+                setattr(ctranslator, name, _originals.pop(name))
+            _originals.clear()
+
+# vim: et sw=4 sts=4
@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+'''
+A long-running compile server, and a client for it.
+
+    ccss serve [--jobs N] [ADDRESS]
+
+keeps the grammar, the translator and the caches warm, and compiles
+stylesheets sent to it over a local socket. ADDRESS is a path (or
+"unix:PATH") for a Unix socket, or "[HOST:]PORT" for TCP, which binds to
+127.0.0.1 unless a host is given. Connections are served concurrently and
+stay open for any number of requests; with --jobs the compiling is spread
+over that many processes.
+
+The protocol is one JSON object per line each way. A request is
+
+    {"id": 1, "source": "a:\\n    top: 1px\\n", "indent": 2, "minified": false,
+     "variables": {}, "fname": "a.ccss"}
+
+where everything but "source" is optional, and the response is either
+{"id": 1, "css": "..."} or {"id": 1, "error": "...", "kind": "ParseError"},
+with the id of the request, if it had one. {"command": "ping"} and
+{"command": "stats"} report that the server is up and how its caches do.
+
+From Python:
+
+    client = Client('/tmp/ccss.sock')
+    css = client.convert(source, indent=4)
+'''
+
+from optparse import OptionParser
+import SocketServer
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+
+DEFAULT_ADDRESS = '127.0.0.1:7392'
+
+## the longest request line accepted, in bytes
+MAX_REQUEST = 64 << 20
+
+OPTIONS = ('indent', 'minified', 'variables', 'fname')
+
+class RemoteError(Exception):
+    '''A stylesheet the server couldn't compile; `kind` is the name of the
+    exception it raised there.'''
+    def __init__(self, message, kind=None):
+        Exception.__init__(self, message)
+        self.kind = kind
+
+def parse_address(address):
+    '''("unix", path) or ("tcp", (host, port)) for an address string.'''
+    if address.startswith('unix:'):
+        return 'unix', address[len('unix:'):]
+    elif '/' in address:
+        return 'unix', address
+    host, _, port = address.rpartition(':')
+    try:
+        return 'tcp', (host or '127.0.0.1', int(port))
+    except ValueError:
+        raise ValueError('invalid address: %s' % address)
+
+def compile_request(source, options):
+    '''Compile one request; the response, without its id.'''
+    import clevercss
+    try:
+        return {'css': clevercss.convert(source, **options)}
+    except Exception, e:
+        ## whatever went wrong, the connection stays usable
+        return {'error': str(e), 'kind': e.__class__.__name__}
+
+def init_worker():
+    ## ^C is for the server, which stops the workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    ## build the grammar and translator once per worker, not per request
+    import clevercss.ctranslator
+
+class Handler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline(self.server.max_request + 1)
+            if not line:
+                return
+            if not line.endswith('\n') and len(line) > self.server.max_request:
+                self.reply({'error': 'request too long', 'kind': 'ProtocolError'})
+                return
+            if line.strip():
+                self.reply(self.server.respond(line))
+
+    def reply(self, response):
+        self.wfile.write(json.dumps(response) + '\n')
+
+class Server(object):
+    '''Serves compile requests on `address` until `shutdown` is called.'''
+    def __init__(self, address=DEFAULT_ADDRESS, jobs=1, max_request=MAX_REQUEST):
+        import clevercss.ctranslator, clevercss.cache
+        self.cache = clevercss.cache
+        self.kind, where = parse_address(address)
+        if self.kind == 'unix':
+            remove_stale(where)
+            self.server = ThreadedUnixServer(where, Handler)
+            self.address = 'unix:' + where
+        else:
+            self.server = ThreadedTCPServer(where, Handler)
+            self.address = '%s:%d' % self.server.server_address
+        self.server.respond = self.respond
+        self.server.max_request = max_request
+        self.jobs = jobs
+        self.pool = None
+        if jobs > 1:
+            import multiprocessing
+            self.pool = multiprocessing.Pool(jobs, init_worker)
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def respond(self, line):
+        '''The response to one request line.'''
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('a request must be an object')
+        except ValueError, e:
+            request = {}
+            response = {'error': 'invalid request: %s' % e, 'kind': 'ProtocolError'}
+        else:
+            response = self.dispatch(request)
+        with self._lock:
+            self.requests += 1
+            if 'error' in response:
+                self.errors += 1
+        if 'id' in request:
+            response['id'] = request['id']
+        return response
+
+    def dispatch(self, request):
+        if 'command' in request:
+            return self.command(request['command'])
+        elif not isinstance(request.get('source'), basestring):
+            return {'error': 'missing "source"', 'kind': 'ProtocolError'}
+        ## compile the same bytes reading a file would give
+        source = request['source'].encode('utf8')
+        options = dict((str(name), request[name]) for name in OPTIONS if name in request)
+        if self.pool is not None:
+            return self.pool.apply(compile_request, (source, options))
+        return compile_request(source, options)
+
+    def command(self, name):
+        if name == 'ping':
+            return {'ok': True}
+        elif name == 'stats':
+            stats = {'requests': self.requests, 'errors': self.errors, 'jobs': self.jobs}
+            ## with workers, the caches that matter are theirs
+            if self.pool is None:
+                for which in ('ast_cache', 'result_cache'):
+                    cache = getattr(self.cache, which)
+                    stats[which] = cache and cache.stats()
+            return stats
+        return {'error': 'unknown command: %s' % name, 'kind': 'ProtocolError'}
+
+    def serve_forever(self, poll_interval=0.5):
+        self.server.serve_forever(poll_interval)
+
+    def shutdown(self):
+        '''Stop serving (from another thread) and close.'''
+        self.server.shutdown()
+        self.close()
+
+    def close(self):
+        self.server.server_close()
+        if self.pool is not None:
+            self.pool.terminate()
+        if self.kind == 'unix':
+            os.remove(self.server.server_address)
+
+## a burst of clients connecting at once must not overflow the listen queue
+BACKLOG = 128
+
+class ThreadedTCPServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = BACKLOG
+
+class ThreadedUnixServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = BACKLOG
+
+def remove_stale(path):
+    '''Remove the socket a server that is gone left behind.'''
+    if not os.path.exists(path):
+        return
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error:
+        os.remove(path)
+    else:
+        raise ValueError('a server is already listening on %s' % path)
+    finally:
+        sock.close()
+
+class Client(object):
+    '''A connection to a compile server, kept open between requests.
+    Threads may share one; their requests take turns.'''
+    def __init__(self, address=DEFAULT_ADDRESS, timeout=None):
+        self.address = address
+        self.timeout = timeout
+        self.sock = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        kind, where = parse_address(self.address)
+        family = socket.AF_UNIX if kind == 'unix' else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(where)
+        except socket.error:
+            sock.close()
+            raise
+        if kind == 'tcp':
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock, self.rfile = sock, sock.makefile('rb')
+
+    def request(self, request):
+        '''Send one request object; return the response object.'''
+        line = json.dumps(request) + '\n'
+        with self._lock:
+            if self.sock is None:
+                self.connect()
+            try:
+                self.sock.sendall(line)
+                response = self.rfile.readline()
+            except socket.error:
+                self.close()
+                raise
+            if not response:
+                self.close()
+                raise socket.error('the server closed the connection')
+        return json.loads(response)
+
+    def convert(self, source, **options):
+        '''Like clevercss.convert, but compiled by the server; failures
+        raise RemoteError.'''
+        request = dict(options, source=source)
+        response = self.request(request)
+        if 'error' in response:
+            raise RemoteError(response['error'], response.get('kind'))
+        return response['css']
+
+    def ping(self):
+        return self.request({'command': 'ping'}).get('ok', False)
+
+    def stats(self):
+        return self.request({'command': 'stats'})
+
+    def close(self):
+        if self.sock is not None:
+            self.rfile.close()
+            self.sock.close()
+            self.sock = None
+
+def main(argv=None):
+    parser = OptionParser(usage='%prog serve [options] [ADDRESS]\n\n'
+            '  ADDRESS is a Unix socket path or [HOST:]PORT (default ' + DEFAULT_ADDRESS + ')')
+    parser.add_option('-j', '--jobs', type='int', default=1,
+            help='number of processes compiling (default 1)')
+    options, args = parser.parse_args(argv)
+    if len(args) > 1:
+        parser.error('only one address can be given')
+    try:
+        server = Server(args and args[0] or DEFAULT_ADDRESS, jobs=options.jobs)
+    except (ValueError, socket.error), e:
+        sys.stderr.write('Error: %s\n' % e)
+        return 1
+    print 'Serving on %s...' % server.address
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        sys.stderr.write('Interrupted\n')
+    finally:
+        server.close()
+    return 0
+
+# vim: et sw=4 sts=4
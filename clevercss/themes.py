@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+'''
+Compiling variants of one stylesheet that differ in a few variables.
+
+    themes = ThemeCompiler(source, {'primary': '#336699', 'size': '10px'})
+    dark = themes.compile({'primary': '#222'})
+
+gives the same css as clevercss.convert(source, variables) with the
+overrides applied to the base variables, but only evaluates what they
+change. The base compile keeps the css of every top-level statement and,
+in rules that hold nothing but attributes and nested rules, of every
+attribute. `deps.dependency_graph` tells which top-level names depend on
+the overridden variables; the attributes that use one of them (or the
+whole statement, for anything but such rules) are translated again and
+patched into the base css. Assignments and mixin definitions that aren't
+affected bind what they bound in the base compile, without evaluating
+anything.
+'''
+
+from ctranslator import CCSS, new_scope, emit, expand_selector, fingerprint, indent, ast
+import clevercss
+import cache
+import deps
+
+class ThemeCompiler(object):
+    '''Compile `source` once with `variables`, then `compile` variants of it.
+
+    `translated` and `reused` count the attributes and statements the last
+    `compile` translated again and the top-level statements it copied.
+    '''
+    def __init__(self, source, variables={}, indent=2, fname=None, minified=False):
+        self.source = source
+        self.variables = dict(variables)
+        self.options = dict(indent=indent, fname=fname, minified=minified)
+        self.tree = cache.parse(source)
+        self.graph = deps.dependency_graph(self.tree)
+        self.translated = self.reused = 0
+        self._build()
+
+    def _build(self):
+        scope = new_scope(variables=self.variables, **self.options)
+        self.base = dict((name, scope.vbls.lookup(name)) for name in self.variables)
+        ## index of a binding statement -> the name and what it bound
+        self.bound = {}
+        ## index of a plain rule -> its [selector, attributes, css] blocks
+        self.rules = {}
+        ## name -> (statement, block, attribute) of everything using it;
+        ## block is None where the whole statement has to be translated
+        self.users = {}
+        chunks = []
+        for index, statement in enumerate(self.tree.body):
+            if plain_rule(statement):
+                blocks = layout(statement, ('',), [])
+                for b, (selector, attributes, texts) in enumerate(blocks):
+                    for a, attribute in enumerate(attributes):
+                        texts.append(render(attribute, scope))
+                        self.use(attribute, (index, b, a))
+                self.rules[index] = blocks
+                chunks.append(join_blocks(blocks))
+                continue
+            chunks.append(translate(statement, scope))
+            self.use(statement, (index, None, None))
+            name = binds(statement)
+            if name is not None:
+                self.bound[index] = name, scope.vbls.lookup(name)
+        self.offsets = [0]
+        for chunk in chunks:
+            self.offsets.append(self.offsets[-1] + len(chunk))
+        self.css = ''.join(chunks)
+
+    def use(self, node, where):
+        for name in deps.names_used(node):
+            self.users.setdefault(name, []).append(where)
+
+    def compile(self, overrides):
+        '''The css for the base variables updated with `overrides`.'''
+        variables = dict(self.variables)
+        variables.update(overrides)
+        results = cache.result_cache
+        if results is not None:
+            key = cache.result_key(clevercss.VERSION, self.source, variables,
+                                   self.options['indent'], self.options['minified'])
+            css = results.get(key)
+            if css is not None:
+                self.translated, self.reused = 0, len(self.tree.body)
+                return css
+        scope = new_scope(variables=variables, **self.options)
+        changed = [name for name in overrides if name not in self.base or
+                   fingerprint(scope.vbls.lookup(name)) != fingerprint(self.base[name])]
+        patches = {}
+        for name in deps.affected(self.graph, changed):
+            for index, block, attribute in self.users.get(name, ()):
+                if block is None:
+                    patches[index] = None
+                elif patches.get(index, ()) is not None:
+                    patches.setdefault(index, set()).add((block, attribute))
+        self.translated = 0
+        pieces, last = [], 0
+        for index in sorted(set(patches).union(self.bound)):
+            if index not in patches:
+                name, value = self.bound[index]
+                scope.vbls.assign(name, value)
+                continue
+            if patches[index] is None:
+                chunk = translate(self.tree.body[index], scope)
+                self.translated += 1
+            else:
+                chunk = self.patch(self.rules[index], patches[index], scope)
+                self.translated += len(patches[index])
+            pieces.append(self.css[last:self.offsets[index]])
+            pieces.append(chunk)
+            last = self.offsets[index + 1]
+        pieces.append(self.css[last:])
+        self.reused = len(self.tree.body) - len(patches)
+        css = ''.join(pieces)
+        if results is not None:
+            results.set(key, css)
+        return css
+
+    def patch(self, blocks, changes, scope):
+        blocks = [(selector, attributes, list(texts)) for selector, attributes, texts in blocks]
+        for b, a in changes:
+            blocks[b][2][a] = render(blocks[b][1][a], scope)
+        return join_blocks(blocks)
+
+def binds(statement):
+    '''The name a top-level statement binds, if any.'''
+    if isinstance(statement, ast.Assign):
+        return statement.left.value
+    elif isinstance(statement, ast.RuleDef):
+        return deps.mixin_name(statement.selector.value)
+    return None
+
+def plain_rule(node):
+    '''Whether `node` is a rule holding nothing but attributes and rules like
+    it, so that its css is the same wherever the attributes are rendered.'''
+    if not isinstance(node, ast.RuleDef) or deps.mixin_name(node.selector.value) is not None:
+        return False
+    return all(isinstance(item, ast.Attribute) or plain_rule(item) for item in node.body)
+
+def layout(node, parents, blocks):
+    '''The blocks emit_rule writes for a plain rule, in the same order: the
+    rule's own attributes, then its nested rules.'''
+    selectors = expand_selector(parents, node.selector.value[:-1].strip())
+    attributes = []
+    blocks.append((', '.join(selectors), attributes, []))
+    for item in node.body:
+        if isinstance(item, ast.Attribute):
+            attributes.append(item)
+        else:
+            layout(item, selectors, blocks)
+    return blocks
+
+def join_blocks(blocks):
+    return ''.join('%s {\n%s}\n' % (selector, ''.join(texts))
+                   for selector, attributes, texts in blocks if texts)
+
+def render(attribute, scope):
+    return indent(CCSS.translate(attribute, scope), scope.indent)
+
+def translate(statement, scope):
+    out = []
+    emit(statement, scope, out)
+    return ''.join(out)
+
+# vim: et sw=4 sts=4
@@ -7,6 +7,7 @@ import operator
 import grammar
 import values
 import consts
+from lru import LRUCache
 
 translators = {}
 def translates(name):
@@ -31,6 +32,9 @@ def indent(text, num):
     white = ' '*num
     return ''.join(white + line for line in text.splitlines(True))
 
+## parsed default values of mixin arguments, keyed by their text
+default_trees = LRUCache(512)
+
 def define_mixin(sel, node, scope):
     sel = sel.strip()
     if '(' in sel[1:]:
@@ -46,8 +50,11 @@ def define_mixin(sel, node, scope):
                 dflag = True
                 n, v = arg.strip().split('=')
                 pos.append(n)
-                dnode = grammar.grammar.process(v, grammar.add_ex)
-                dnode = grammar.grammar.toAst(dnode)
+                dnode = default_trees.get(v)
+                if dnode is None:
+                    dnode = grammar.grammar.process(v, grammar.add_ex)
+                    dnode = grammar.grammar.toAst(dnode)
+                    default_trees.set(v, dnode)
                 defaults[n] = translate(dnode, scope)
             elif dflag:
                 raise TranslateError('positional argument after default argument: %s' % (repr(node)))
@@ -1,21 +1,63 @@
 #!/usr/bin/env python
 import operator
 import consts
+import math
 import re
 
+## numpy takes longer to import than the rest of clevercss, so it is only
+## imported by the first _combine that can use it; False if it isn't installed
+numpy = None
+
+## compiled versions of the py_ functions below, when the extension is built
+try:
+    import _speedups
+except ImportError:
+    _speedups = None
+
 class Value(object):
+    '''Base class of the values expressions evaluate to.
+
+    Values are immutable, so they can be shared freely: between identical
+    literals, between cached trees and between translations.
+    '''
+    __slots__ = ('value',)
     methods = []
     def __init__(self, value, raw=True):
         if raw:
             value = self.parse(value)
-        self.value = value
-    
+        _set_value(self, value)
+
+    @classmethod
+    def make(cls, value):
+        '''Build a value from its parsed form, skipping `parse`.'''
+        self = object.__new__(cls)
+        _set_value(self, value)
+        return self
+
     def parse(self, value):
         return value
+
+    def __setattr__(self, name, value):
+        raise AttributeError('%s objects are immutable' % self.__class__.__name__)
+
+    __delattr__ = __setattr__
+
+    def __reduce__(self):
+        return _make, (self.__class__, self.value)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
     
     def __repr__(self):
         return str(self)
 
+    def css(self, minified=False):
+        '''The text to write into the stylesheet.'''
+        return str(self)
+
     def calc(self, op, other):
         return NotImplemented
 
@@ -26,17 +68,51 @@ class Value(object):
     __rdiv__ = lambda self, other: self.calc(other, operator.div, True)
     __mul__ = lambda self, other: self.calc(other, operator.mul)
 
+_set_value = Value.value.__set__
+
+def _make(cls, value):
+    return cls.make(value)
+
+NUMBER = re.compile(r'(-?(?:\d+(?:\.\d+)?|\.\d+))(px|em|%|pt)?')
+
+def py_parse_number(text):
+    '''Split a number literal into its value and units.'''
+    match = NUMBER.match(text)
+    if not match:
+        raise ValueError("invalid number '%s'" % text.encode('string_escape'))
+    num, units = match.groups()
+    num = float(num)
+    if int(num) == num:
+        num = int(num)
+    return num, units
+
+def py_number_calc(left, right, op, reverse=False):
+    '''Do math on the values of two Numbers; None if it can't be done.'''
+    if reverse:
+        newvalue = op(right[0], left[0])
+    else:
+        newvalue = op(left[0], right[0])
+    if right[1] == left[1]:
+        return newvalue, left[1]
+    elif left[1] and right[1]:
+        raise ValueError('cannot do math on numbers of differing units')
+    elif left[1]:
+        return newvalue, left[1]
+    elif right[1]:
+        return newvalue, right[1]
+    return None
+
+if _speedups is not None:
+    parse_number = _speedups.parse_number
+    number_calc = _speedups.number_calc
+else:
+    parse_number = py_parse_number
+    number_calc = py_number_calc
+
 class Number(Value):
-    rx = re.compile(r'(-?(?:\d+(?:\.\d+)?|\.\d+))(px|em|%|pt)?')
+    __slots__ = ()
     def parse(self, value):
-        match = self.rx.match(value)
-        if not match:
-            raise ValueError("invalid number '%s'" % value.encode('string_escape'))
-        num,units = match.groups()
-        num = float(num)
-        if int(num) == num:
-            num = int(num)
-        return num, units
+        return parse_number(value)
         
     def __str__(self):
         if self.value[1]:
@@ -45,72 +121,242 @@ class Number(Value):
 
     def calc(self, other, op, reverse=False):
         if isinstance(other, Number):
-            if reverse:
-                newvalue = op(other.value[0], self.value[0])
-            else:
-                newvalue = op(self.value[0], other.value[0])
-            if other.value[1] == self.value[1]:
-                return Number((newvalue, self.value[1]), False)
-            elif self.value[1] and other.value[1]:
-                raise ValueError('cannot do math on numbers of differing units')
-            elif self.value[1]:
-                return Number((newvalue, self.value[1]), False)
-            elif other.value[1]:
-                return Number((newvalue, other.value[1]), False)
+            value = number_calc(self.value, other.value, op, reverse)
+            if value is not None:
+                return Number.make(value)
         return NotImplemented
 
     methods = ['abs', 'round']
     def abs(self):
-        return Number((abs(self.value[0]), self.value[1]), False)
+        return Number.make((abs(self.value[0]), self.value[1]))
 
     def round(self, places=0):
-        return Number((round(self.value[0], places), self.value[1]), False)
+        return Number.make((round(self.value[0], places), self.value[1]))
 
 class String(Value):
+    __slots__ = ()
     def __str__(self):
         return self.value
 
 class Color(Value):
+    __slots__ = ()
     def parse(self, value):
         if len(value) == 4:
             value = '#' + value[1]*2 + value[2]*2 + value[3]*2
         return int(value[1:3], 16), int(value[3:5], 16), int(value[5:], 16)
 
+    def packed(self):
+        r, g, b = self.value
+        return r << 16 | g << 8 | b
+
     def __str__(self):
-        value = '#%02x%02x%02x' % self.value
-        return consts.REV_COLORS.get(value) or value
+        packed = self.packed()
+        return consts.COLOR_NAMES.get(packed) or '#%06x' % packed
 
-    def calc(self, other, op):
+    def css(self, minified=False):
+        packed = self.packed()
+        if minified:
+            return consts.SHORTEST_COLORS.get(packed) or '#%06x' % packed
+        return consts.COLOR_NAMES.get(packed) or '#%06x' % packed
+
+    def calc(self, other, op, reverse=False):
         if isinstance(other, Color):
-            return Color(tuple(op(a, b) for a,b in zip(self.value, other.value)), False)
+            other = other.value
         elif isinstance(other, Number):
             if other.value[1]:
                 return NotImplemented
-            return Color(tuple(op(a, other.value[0]) for a in self.value), False)
-        return NotImplemented
+            other = other.value[0]
+        else:
+            return NotImplemented
+        if reverse:
+            return Color.make(_combine(lambda a, b: op(b, a), (self.value,), other)[0])
+        return Color.make(_combine(op, (self.value,), other)[0])
 
-    methods = ['brighten', 'darken']
+    methods = ['brighten', 'darken', 'mix']
 
     def brighten(self, amount=Number('10%')):
-        if not isinstance(amount, Number) or amount not in (None, '%'):
-            raise ValueError('invalid arg for brighten: %s' % amount)
-        num = amount.value[0]
-        if amount.value[1] == '%':
-            num /= 100.0
-        num += 1.0
-        hsv = colorsys.rgb_to_hsv(v/255.0 for v in self.value)
-        hsv[2] *= num
-        return Color(tuple(int(v * 255) for v in colorsys.hsv_to_rgb(hsv)), False)
-        
+        return Color.make(_combine(operator.mul, (self.value,), 1 + _fraction(amount, 'brighten'))[0])
+
+    def darken(self, amount=Number('10%')):
+        return Color.make(_combine(operator.mul, (self.value,), 1 - _fraction(amount, 'darken'))[0])
+
+    def mix(self, other, weight=Number('50%')):
+        return ColorArray.make((self.value,)).mix(other, weight)[0]
+
+class ColorArray(Value):
+    '''A row of colors that brighten, darken, mix and do math all at once.
+
+    The value is a tuple of rgb tuples. Every operation handles the whole
+    row in one go, with numpy when it is installed.
+    '''
+    __slots__ = ()
+    def parse(self, colors):
+        return tuple(color.value for color in colors)
+
+    def __str__(self):
+        return ', '.join(str(color) for color in self)
+
+    def css(self, minified=False):
+        return ', '.join(color.css(minified) for color in self)
+
+    def __len__(self):
+        return len(self.value)
+
+    def __iter__(self):
+        return (Color.make(value) for value in self.value)
+
+    def __getitem__(self, index):
+        if isinstance(index, Number):
+            index = index.value[0]
+        return Color.make(self.value[int(index)])
+
+    def calc(self, other, op, reverse=False):
+        if isinstance(other, ColorArray):
+            if len(other) != len(self):
+                raise ValueError('cannot do math on palettes of differing lengths')
+            other = other.value
+        elif isinstance(other, Color):
+            other = other.value
+        elif isinstance(other, Number):
+            if other.value[1]:
+                return NotImplemented
+            other = other.value[0]
+        else:
+            return NotImplemented
+        if reverse:
+            return ColorArray.make(_combine(lambda a, b: op(b, a), self.value, other))
+        return ColorArray.make(_combine(op, self.value, other))
+
+    __radd__ = lambda self, other: self.calc(other, operator.add, True)
+    __rmul__ = lambda self, other: self.calc(other, operator.mul, True)
+
+    methods = ['brighten', 'darken', 'mix']
+
+    def brighten(self, amount=Number('10%')):
+        return ColorArray.make(_combine(operator.mul, self.value, 1 + _fraction(amount, 'brighten')))
+
     def darken(self, amount=Number('10%')):
-        if not isinstance(amount, Number) or amount not in (None, '%'):
-            raise ValueError('invalid arg for brighten: %s' % amount)
-        num = amount.value[0] * -1
-        if amount.value[1] == '%':
-            num /= 100.0
-        num += 1.0
-        hsv = colorsys.rgb_to_hsv(v/255.0 for v in self.value)
-        hsv[2] *= num
-        return Color(tuple(int(v * 255) for v in colorsys.hsv_to_rgb(hsv)), False)
+        return ColorArray.make(_combine(operator.mul, self.value, 1 - _fraction(amount, 'darken')))
+
+    def mix(self, other, weight=Number('50%')):
+        '''Blend with another color (or a palette of the same length); the
+        weight is how much of this one to keep.'''
+        if not isinstance(other, (Color, ColorArray)):
+            raise ValueError('invalid arg for mix: %s' % other)
+        if isinstance(other, ColorArray) and len(other) != len(self):
+            raise ValueError('cannot mix palettes of differing lengths')
+        weight = _fraction(weight, 'mix')
+        return ColorArray.make(_combine(lambda a, b: a * weight + b * (1 - weight),
+                                        self.value, other.value))
+
+def palette(*args):
+    '''The palette() stylesheet function.
+
+    palette(a, b, c) is a ColorArray of the given colors, and
+    palette(start, end, steps) an even ramp of `steps` colors from start to end.
+    '''
+    if len(args) == 3 and isinstance(args[2], Number):
+        start, end, steps = args
+        if steps.value[1] or steps.value[0] != int(steps.value[0]) or steps.value[0] < 2:
+            raise ValueError('invalid number of steps for palette: %s' % steps)
+        steps = int(steps.value[0])
+        weights = tuple((i / (steps - 1.0),) * 3 for i in range(steps))
+        return ColorArray.make(_combine(lambda a, b, t: a + (b - a) * t,
+                                        (_color_arg(start).value,) * steps,
+                                        _color_arg(end).value, weights))
+    return ColorArray([_color_arg(arg) for arg in args])
+
+def _color_arg(arg):
+    if not isinstance(arg, Color):
+        raise ValueError('invalid arg for palette: %s' % arg)
+    return arg
+
+def _fraction(amount, name):
+    '''A unitless or percentage Number as a fraction.'''
+    if not isinstance(amount, Number) or amount.value[1] not in (None, '%'):
+        raise ValueError('invalid arg for %s: %s' % (name, amount))
+    if amount.value[1] == '%':
+        return amount.value[0] / 100.0
+    return float(amount.value[0])
+
+## Scaling the value of an hsv color scales its rgb channels by the same
+## factor, so brighten and darken are plain channel arithmetic too.
+## numpy only pays off past a handful of colors.
+NUMPY_MIN = 8
+
+def _combine(func, rows, *others):
+    '''Apply `func` channel by channel to a tuple of rgb tuples and some
+    other operands -- numbers, rgb tuples or rows of the same length --
+    rounding and clamping the results into rgb tuples again.'''
+    if len(rows) >= NUMPY_MIN and _load_numpy():
+        result = func(*[numpy.asarray(item, dtype=float) for item in (rows,) + others])
+        result = numpy.clip(numpy.floor(result + .5), 0, 255).astype(int)
+        return tuple(map(tuple, result.tolist()))
+    return combine_rows(func, rows, others)
+
+def _load_numpy():
+    global numpy
+    if numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+    return numpy
+
+def py_combine_rows(func, rows, others):
+    columns = [rows] + [_broadcast(item, len(rows)) for item in others]
+    return tuple(tuple(_channel(func(*map(float, channel))) for channel in zip(*colors))
+                 for colors in zip(*columns))
+
+if _speedups is not None:
+    combine_rows = _speedups.combine_rows
+else:
+    combine_rows = py_combine_rows
+
+def _broadcast(item, count):
+    if isinstance(item, (int, long, float)):
+        return ((item,) * 3,) * count
+    elif not isinstance(item[0], (tuple, list)):
+        return (item,) * count
+    return item
+
+def _channel(value):
+    return max(0, min(255, int(math.floor(value + .5))))
+
+## literals are interned, so a stylesheet full of "0" and "1px" shares a
+## handful of objects instead of parsing and allocating one per occurrence.
+INTERN_LIMIT = 4096
+_numbers = {}
+_colors = {}
+
+def number(text):
+    '''The Number for a literal, shared with every other use of it.'''
+    try:
+        return _numbers[text]
+    except KeyError:
+        value = Number(text)
+        if len(_numbers) < INTERN_LIMIT:
+            _numbers[text] = value
+        return value
+
+def color(text):
+    '''The Color for a hex literal, shared with every other use of it.'''
+    try:
+        return _colors[text]
+    except KeyError:
+        value = Color(text)
+        if len(_colors) < INTERN_LIMIT:
+            _colors[text] = value
+        return value
+
+def named_color(name):
+    '''The Color for one of the names in consts.COLORS.'''
+    return color(consts.COLORS[name])
+
+for _text in ('0', '1', '0px', '1px', '2px', '100%', '50%', '0em', '1em'):
+    number(_text)
+for _name in consts.COLORS:
+    named_color(_name)
+del _text, _name
 
 # vim: et sw=4 sts=4
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+'''
+The variable scopes of a translation.
+
+Every rule and mixin call opens a new frame of variables. `Variables` keeps
+the frames in a list with the innermost frame at the end, so pushing and
+popping are O(1), and remembers where each looked-up name resolved to, so
+repeated lookups don't rescan every frame. A cached name is forgotten
+whenever it is assigned to or the frame defining it is popped.
+
+For compatibility it still looks like the old list of dicts (innermost
+first): `vbls[0]` is the innermost frame, and `vbls.insert(0, {})` and
+`vbls.pop(0)` push and pop.
+'''
+
+import copy
+
+class Frame(dict):
+    '''One frame of variables, which tells its owner about assignments.'''
+    __slots__ = ('owner',)
+
+    def __init__(self, owner, items=()):
+        dict.__init__(self, items)
+        self.owner = owner
+
+    def __setitem__(self, name, value):
+        dict.__setitem__(self, name, value)
+        self.owner._cache.pop(name, None)
+
+    def __delitem__(self, name):
+        dict.__delitem__(self, name)
+        self.owner._cache.pop(name, None)
+
+    def _changed(method):
+        def meta(self, *args, **kwargs):
+            self.owner._cache.clear()
+            return method(self, *args, **kwargs)
+        meta.__name__ = method.__name__
+        return meta
+
+    update = _changed(dict.update)
+    setdefault = _changed(dict.setdefault)
+    pop = _changed(dict.pop)
+    popitem = _changed(dict.popitem)
+    clear = _changed(dict.clear)
+    del _changed
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+class Variables(object):
+    '''A stack of variable frames with a flattened lookup cache.'''
+    def __init__(self, frames=()):
+        self._frames = []
+        self._cache = {}
+        for frame in reversed(list(frames)):
+            self.push(frame)
+
+    def push(self, frame=None):
+        frame = Frame(self, frame or ())
+        for name in frame:
+            self._cache.pop(name, None)
+        self._frames.append(frame)
+        return frame
+
+    def pop(self, index=0):
+        if index != 0:
+            self._cache.clear()
+            return self._frames.pop(-1 - index)
+        frame = self._frames.pop()
+        for name in frame:
+            self._cache.pop(name, None)
+        return frame
+
+    def insert(self, index, frame):
+        if index != 0:
+            self._cache.clear()
+            self._frames.insert(len(self._frames) - index, Frame(self, frame))
+        else:
+            self.push(frame)
+
+    def assign(self, name, value):
+        '''Bind a name in the innermost frame.'''
+        self._frames[-1][name] = value
+
+    def lookup(self, name):
+        '''Find the innermost binding of a name, or raise KeyError.'''
+        try:
+            return self._cache[name]
+        except KeyError:
+            pass
+        for frame in reversed(self._frames):
+            if name in frame:
+                value = self._cache[name] = frame[name]
+                return value
+        raise KeyError(name)
+
+    def __getitem__(self, index):
+        return self._frames[-1 - index]
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __iter__(self):
+        return reversed(self._frames)
+
+    def __deepcopy__(self, memo):
+        return Variables([copy.deepcopy(dict(frame), memo) for frame in self])
+
+    def __reduce__(self):
+        return Variables, ([dict(frame) for frame in self],)
+
+# vim: et sw=4 sts=4
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+'''
+Wait for files to change.
+
+`changes` uses inotify when pyinotify is installed and falls back to
+polling modification times otherwise.
+'''
+
+import os
+import time
+
+try:
+    import pyinotify
+except ImportError:
+    pyinotify = None
+
+def method():
+    return pyinotify and 'inotify' or 'polling'
+
+def changes(fnames, interval=0.5):
+    '''Yield a sorted list of the given files that changed, every time some do.'''
+    if pyinotify is not None:
+        return inotify_changes(fnames)
+    return poll_changes(fnames, interval)
+
+def mtime(fname):
+    try:
+        return os.stat(fname).st_mtime
+    except OSError:
+        return None
+
+def poll_changes(fnames, interval=0.5):
+    seen = dict((fname, mtime(fname)) for fname in fnames)
+    while True:
+        time.sleep(interval)
+        changed = []
+        for fname in fnames:
+            now = mtime(fname)
+            if now != seen[fname]:
+                seen[fname] = now
+                if now is not None:
+                    changed.append(fname)
+        if changed:
+            yield sorted(changed)
+
+def inotify_changes(fnames):
+    ## editors often save by writing a new file and renaming it over the old
+    ## one, so watch the directories rather than the files themselves.
+    wanted = dict((os.path.abspath(fname), fname) for fname in fnames)
+    pending = set()
+
+    class Handler(pyinotify.ProcessEvent):
+        def process_default(self, event):
+            if event.pathname in wanted:
+                pending.add(wanted[event.pathname])
+
+    manager = pyinotify.WatchManager()
+    mask = pyinotify.IN_CLOSE_WRITE | pyinotify.IN_MOVED_TO
+    for directory in set(os.path.dirname(path) for path in wanted):
+        manager.add_watch(directory, mask)
+    notifier = pyinotify.Notifier(manager, Handler())
+    try:
+        while True:
+            if notifier.check_events():
+                notifier.read_events()
+                notifier.process_events()
+            if pending:
+                yield sorted(pending)
+                pending.clear()
+    finally:
+        notifier.stop()
+
+# vim: et sw=4 sts=4
@@ -1,6 +1,71 @@
 #!/usr/bin/env python
-from distutils.core import setup
+from distutils.core import setup, Command, Extension
+from distutils.command.build_ext import build_ext
+from distutils.command.build_py import build_py
+from distutils.errors import CCompilerError, DistutilsError
 import os
+import sys
+
+try:
+    from Cython.Distutils import build_ext
+except ImportError:
+    cython = False
+else:
+    cython = True
+
+class optional_build_ext(build_ext):
+    '''The compiled speedups are optional; clevercss works without them.'''
+    def run(self):
+        try:
+            build_ext.run(self)
+        except (CCompilerError, DistutilsError), e:
+            self.warn('not building the speedups: %s' % e)
+
+    def build_extension(self, ext):
+        try:
+            build_ext.build_extension(self, ext)
+        except (CCompilerError, DistutilsError), e:
+            self.warn('not building the speedups: %s' % e)
+
+class bench(Command):
+    description = 'time each stage of the compiler on generated stylesheets'
+    user_options = [('args=', None, 'options for ccss bench, e.g. "--rules 500 -o out.json"')]
+
+    def initialize_options(self):
+        self.args = ''
+
+    def finalize_options(self):
+        pass
+
+    def run(self):
+        from clevercss import bench
+        if bench.main(self.args.split()):
+            sys.exit(1)
+
+class build_grammar(Command):
+    description = 'precompile the grammar into clevercss/grammar.table'
+    user_options = []
+
+    def initialize_options(self):
+        pass
+
+    def finalize_options(self):
+        pass
+
+    def run(self):
+        ## the table is optional too; without it the grammar is built at import
+        try:
+            from clevercss import grammar_table
+            grammar_table.write()
+        except (ImportError, ValueError), e:
+            self.warn('not precompiling the grammar: %s' % e)
+
+class build_py_with_grammar(build_py):
+    def run(self):
+        self.run_command('build_grammar')
+        ## package_data was looked up before the table was written
+        self.data_files = self.get_data_files()
+        build_py.run(self)
 
 fp = open(os.path.join(os.path.dirname(__file__), "README.rst"))
 readme_text = fp.read()
@@ -14,6 +79,7 @@ setup(
     url='http://github.com/jabapyth/clevercss2',
     download_url='http://github.com/jabapyth/clevercss2/tree',
     packages=['clevercss'],
+    package_data={'clevercss': ['grammar.table']},
     description='python inspired sass-like css preprocessor',
     long_description=readme_text,
     classifiers=[
@@ -23,4 +89,7 @@ setup(
     requires=['codetalker'],
     scripts=['bin/ccss',],
     test_suite = 'tests.all_tests',
+    cmdclass={'bench': bench, 'build_ext': optional_build_ext,
+              'build_grammar': build_grammar, 'build_py': build_py_with_grammar},
+    ext_modules=cython and [Extension('clevercss._speedups', ['clevercss/_speedups.pyx'])] or [],
 )
@@ -11,9 +11,27 @@ import spritemap_test
 import parsing
 import tokenize_
 import one_liners
+import caching
+import incremental
+import streaming
+import variables
+import mixins
+import folding
+import palettes
+import colors
+import bench_
+import profiling
+import lines
+import speedups
+import startup
+import tables
+import serving
+import async_
+import themes
+import command
 
 # mods = [color_convert, ccss_to_css, minify, spritemap_test]
-mods = [parsing, tokenize_, one_liners]
+mods = [parsing, tokenize_, one_liners, caching, incremental, streaming, variables, mixins, folding, palettes, colors, bench_, profiling, lines, speedups, startup, tables, serving, async_, themes, command]
 def all_tests():
     return unittest.TestSuite(getattr(mod, 'all_tests')() for mod in mods)
 
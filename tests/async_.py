@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+
+import magictest
+from magictest import MagicTest as TestCase
+
+import clevercss
+from clevercss import aio, cache, server
+
+class FakeResult(object):
+    '''The AsyncResult of a FakePool job.'''
+    error = None
+
+    def ready(self):
+        return self.error is not None
+
+    def successful(self):
+        return self.error is None
+
+    def get(self, timeout=None):
+        raise self.error
+
+class FakePool(object):
+    '''Runs nothing until told to.'''
+    def __init__(self):
+        self.jobs = []
+        self.results = []
+
+    def apply_async(self, func, args, callback):
+        self.jobs.append((func, args, callback))
+        self.results.append(FakeResult())
+        return self.results[-1]
+
+    def finish(self, index=0):
+        func, args, callback = self.jobs.pop(index)
+        self.results.pop(index)
+        callback(func(*args))
+
+    def fail(self, error, index=0):
+        '''What a pool does when it can't run a job: no callback.'''
+        self.jobs.pop(index)
+        self.results.pop(index).error = error
+
+def source(i):
+    return 'a%d:\n    top: %dpx\n' % (i, i)
+
+class Async(TestCase):
+    def setUp(self):
+        self.results, cache.result_cache = cache.result_cache, cache.ResultCache(size=10)
+        self.pool = FakePool()
+        self.compiler = aio.Compiler(max_running=2, max_waiting=1, pool=self.pool,
+                                     poll_interval=None)
+
+    def tearDown(self):
+        cache.result_cache = self.results
+
+    def convert(self):
+        future = self.compiler.convert(source(1), indent=4)
+        self.assertFalse(future.done())
+        seen = []
+        future.add_done_callback(seen.append)
+        self.pool.finish()
+        self.assertEqual(seen, [future])
+        self.assertEqual(future.result(), clevercss.convert(source(1), indent=4))
+        ## now it comes from the result cache, without a job
+        self.assertTrue(self.compiler.convert(source(1), indent=4).done())
+        self.assertEqual(self.pool.jobs, [])
+
+    def errors(self):
+        future = self.compiler.convert('a:\n    top: ???\n')
+        self.pool.finish()
+        self.assertEqual(future.exception().kind, 'ParseError')
+        self.assertRaises(server.RemoteError, future.result)
+
+    def shared(self):
+        first = self.compiler.convert(source(1))
+        self.assertTrue(self.compiler.convert(source(1)) is first)
+        self.assertFalse(self.compiler.convert(source(1), indent=4) is first)
+        self.assertEqual(len(self.pool.jobs), 2)
+
+    def backpressure(self):
+        running = [self.compiler.convert(source(i)) for i in range(2)]
+        waiting = self.compiler.convert(source(2))
+        self.assertEqual(len(self.pool.jobs), 2)
+        ## waiting ones are shared too
+        self.assertTrue(self.compiler.convert(source(2)) is waiting)
+        self.assertRaises(aio.Busy, self.compiler.convert, source(3))
+        self.pool.finish()
+        self.assertEqual(len(self.pool.jobs), 2)
+        self.assertTrue(running[0].done() and not waiting.done())
+        self.pool.finish(1)
+        self.assertEqual(waiting.result(), clevercss.convert(source(2)))
+        self.compiler.convert(source(3))
+
+    def close(self):
+        futures = [self.compiler.convert(source(i)) for i in range(3)]
+        self.compiler.close()
+        for future in futures:
+            self.assertRaises(aio.Busy, future.result)
+        ## a job finishing late changes nothing
+        self.pool.finish()
+        self.assertTrue(isinstance(futures[0].exception(), aio.Busy))
+
+    def failed_job(self):
+        futures = [self.compiler.convert(source(i)) for i in range(3)]
+        self.pool.fail(RuntimeError('worker died'))
+        self.compiler.check()
+        self.assertEqual(str(futures[0].exception()), 'worker died')
+        ## the slot went to the waiting compile
+        self.assertEqual(len(self.pool.jobs), 2)
+        self.pool.finish(1)
+        self.assertEqual(futures[2].result(), clevercss.convert(source(2)))
+
+    def stuck_job(self):
+        self.compiler.timeout = 0
+        future = self.compiler.convert(source(1))
+        self.compiler.check()
+        self.assertTrue(isinstance(future.exception(), aio.Timeout))
+        ## a new request starts a new job, which the old one finishing late doesn't touch
+        again = self.compiler.convert(source(1))
+        self.assertFalse(again is future)
+        self.pool.finish()
+        self.assertFalse(again.done())
+        self.pool.finish()
+        self.assertEqual(again.result(), clevercss.convert(source(1)))
+
+    def watched(self):
+        compiler = aio.Compiler(pool=self.pool, timeout=0, poll_interval=0.01)
+        try:
+            self.assertTrue(isinstance(compiler.convert(source(1)).exception(5), aio.Timeout))
+        finally:
+            compiler.close()
+
+    def timeout(self):
+        self.assertRaises(aio.Timeout, self.compiler.convert(source(1)).result, 0.01)
+
+    def processes(self):
+        aio.configure(processes=2)
+        try:
+            futures = [aio.convert(source(i)) for i in range(4)]
+            self.assertEqual([future.result(10) for future in futures],
+                             [clevercss.convert(source(i)) for i in range(4)])
+        finally:
+            aio._compiler.close()
+            aio._compiler = None
+
+all_tests = magictest.suite(__name__)
+
+# vim: et sw=4 sts=4
@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+
+from StringIO import StringIO
+
+import magictest
+from magictest import MagicTest as TestCase
+
+import clevercss
+from clevercss import bench
+
+class Bench(TestCase):
+    def generated_compiles(self):
+        css = clevercss.convert(bench.generate(rules=3, depth=2))
+        self.assertTrue('.rule2-0 a:hover .rule2-1 a:hover' in css)
+
+    def results(self):
+        results = bench.run(rules=2, depth=2, repeat=1)
+        self.assertEqual(sorted(results['stages']), sorted(bench.STAGES))
+
+    def compare(self):
+        old = {'stages': dict((name, {'best': 10.0}) for name in bench.STAGES)}
+        new = {'stages': dict((name, {'best': 11.0}) for name in bench.STAGES)}
+        new['stages']['fold']['best'] = 20.0
+        self.assertEqual(bench.compare(old, new, 0.2, StringIO()), ['fold'])
+
+all_tests = magictest.suite(__name__)
+
+# vim: et sw=4 sts=4
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+
+import magictest
+from magictest import MagicTest as TestCase
+
+import clevercss
+from clevercss import cache
+
+source = '''one = 2
+body:
+    top: one+3
+    div, p:
+        color: #f00
+'''
+
+css = '''body {
+    top: 5;
+}
+body div, body p {
+    color: red;
+}
+'''
+
+class ASTCacheTest(TestCase):
+    def setUp(self):
+        self.old = cache.ast_cache, cache.result_cache
+        cache.ast_cache = cache.ASTCache(size=2)
+        cache.result_cache = None
+
+    def tearDown(self):
+        cache.ast_cache, cache.result_cache = self.old
+
+    def hits_and_misses(self):
+        self.assertEqual(clevercss.convert(source, indent=4), css)
+        self.assertEqual(clevercss.convert(source, indent=4), css)
+        self.assertEqual(cache.ast_cache.stats(), {'hits': 1, 'misses': 1, 'size': 1})
+
+    def eviction(self):
+        for text in ('a = 1\n', 'b = 2\n', 'c = 3\n', 'a = 1\n'):
+            cache.parse(text)
+        self.assertEqual(cache.ast_cache.misses, 4)
+        self.assertEqual(len(cache.ast_cache.memory), 2)
+
+    def disk(self):
+        directory = tempfile.mkdtemp()
+        try:
+            cache.ast_cache = cache.ASTCache(directory=directory)
+            clevercss.convert(source, indent=4)
+            cache.ast_cache = cache.ASTCache(directory=directory)
+            self.assertEqual(clevercss.convert(source, indent=4), css)
+            self.assertEqual(cache.ast_cache.hits, 1)
+            self.assertEqual(cache.ast_cache.misses, 0)
+        finally:
+            shutil.rmtree(directory)
+
+    def version(self):
+        ## folded trees hold values, so the key covers the value classes too
+        directory = tempfile.mkdtemp()
+        try:
+            class Module(object):
+                __file__ = os.path.join(directory, 'values.py')
+            open(Module.__file__, 'w').write('# one way of rounding\n')
+            before = cache.grammar_version(cache.TREE_MODULES[:-1] + (Module,))
+            open(Module.__file__, 'w').write('# another\n')
+            self.assertNotEqual(cache.grammar_version(cache.TREE_MODULES[:-1] + (Module,)), before)
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(cache.TREE_MODULES[-2:], (cache.optimize, cache.values))
+
+    def disabled(self):
+        cache.ast_cache = None
+        self.assertEqual(clevercss.convert(source, indent=4), css)
+
+class ResultCacheTest(TestCase):
+    def setUp(self):
+        self.old = cache.result_cache
+        cache.result_cache = cache.ResultCache(size=2)
+
+    def tearDown(self):
+        cache.result_cache = self.old
+
+    def fingerprint(self):
+        clevercss.convert(source, indent=4)
+        self.assertEqual(clevercss.convert(source, indent=4), css)
+        clevercss.convert(source, indent=2)
+        clevercss.convert(source, {'one': '3'}, indent=4)
+        self.assertEqual(cache.result_cache.stats(), {'hits': 1, 'misses': 3, 'size': 2})
+
+    def disk(self):
+        directory = tempfile.mkdtemp()
+        try:
+            cache.result_cache = cache.ResultCache(directory=directory)
+            clevercss.convert(source, indent=4)
+            cache.result_cache = cache.ResultCache(directory=directory)
+            self.assertEqual(clevercss.convert(source, indent=4), css)
+            self.assertEqual(cache.result_cache.hits, 1)
+        finally:
+            shutil.rmtree(directory)
+
+    def translator_changed(self):
+        ## css cached on disk by another version of the translator is stale
+        key = cache.result_key(clevercss.VERSION, source, {}, 4, False)
+        old = cache.OUTPUT_VERSION
+        try:
+            cache.OUTPUT_VERSION = 'another'
+            self.assertNotEqual(cache.result_key(clevercss.VERSION, source, {}, 4, False), key)
+        finally:
+            cache.OUTPUT_VERSION = old
+        for module in (cache.ctranslator, cache.values, cache.consts, cache.optimize):
+            self.assertTrue(module in cache.OUTPUT_MODULES)
+
+all_tests = magictest.suite(__name__)
+
+# vim: et sw=4 sts=4
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+
+import magictest
+from magictest import MagicTest as TestCase
+
+import clevercss
+from clevercss import values, consts
+from clevercss.ctranslator import IDENTIFIERS
+
+class Colors(TestCase):
+    def names(self):
+        self.assertEqual(str(values.color('#ff0000')), 'red')
+        self.assertEqual(str(values.color('#123456')), '#123456')
+        self.assertEqual(values.color('#123456').packed(), 0x123456)
+
+    def shortest(self):
+        for text, short in (('#ffffff', '#fff'), ('#ff0000', 'red'), ('#000080', 'navy'),
+                            ('#112233', '#123'), ('#123456', '#123456')):
+            self.assertEqual(values.color(text).css(minified=True), short)
+
+    def minified_output(self):
+        css = clevercss.convert('a:\n    color: white\n    border: 1px solid #112233\n', minified=True)
+        self.assertEqual(css, 'a {\n  color: #fff;\n  border: 1px solid #123;\n}\n')
+
+    def clamped_math(self):
+        self.assertEqual(str(values.color('#eeeeee') + values.color('#333333')), 'white')
+        self.assertEqual(str(values.color('#333333') - values.number('100')), 'black')
+
+    def identifiers(self):
+        ## css keywords win over color names, as they always did
+        self.assertEqual(IDENTIFIERS['transparent'], 'transparent')
+        self.assertTrue(IDENTIFIERS['teal'] is values.named_color('teal'))
+        self.assertEqual(IDENTIFIERS['url']('x.png'), 'url(x.png)')
+        self.assertEqual(len(IDENTIFIERS), len(consts.COLORS.viewkeys() | consts.CSS_VALUES |
+                                               consts.CSS_FUNCTIONS | set(['palette'])))
+
+all_tests = magictest.suite(__name__)
+
+# vim: et sw=4 sts=4
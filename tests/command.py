@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+import imp
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from StringIO import StringIO
+
+import magictest
+from magictest import MagicTest as TestCase
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def ccss(*args):
+    '''Run bin/ccss; its exit status and stderr.'''
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'bin', 'ccss')] + list(args),
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    out, err = process.communicate()
+    return process.returncode, err
+
+class Errors(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.files = {}
+        for name, text in (('a', 'a:\n    top: 1px\n'), ('undefined', 'b:\n    top: nope * 2\n'),
+                           ('units', 'c:\n    top: 1px + 1em\n'), ('z', 'z:\n    top: 2px\n')):
+            self.files[name] = os.path.join(self.dir, name + '.ccss')
+            open(self.files[name], 'w').write(text)
+        self.files['missing'] = os.path.join(self.dir, 'missing.ccss')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def check(self, *options):
+        names = ['a', 'undefined', 'missing', 'units', 'z']
+        status, err = ccss(*(list(options) + [self.files[name] for name in names]))
+        self.assertEqual(status, 1)
+        for name in ('undefined', 'missing', 'units'):
+            self.assertTrue('Error in file %s' % self.files[name] in err, err)
+        self.assertTrue('Traceback' not in err, err)
+        self.assertEqual(sorted(os.listdir(self.dir)), ['a.ccss', 'a.css', 'undefined.ccss',
+                                                        'units.ccss', 'z.ccss', 'z.css'])
+        self.assertEqual(open(os.path.join(self.dir, 'z.css')).read(), 'z {\n  top: 2px;\n}\n')
+
+    def serial(self):
+        self.check()
+
+    def parallel(self):
+        self.check('-j', '2')
+
+class Watching(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.streams = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = StringIO(), StringIO()
+
+    def tearDown(self):
+        sys.stdout, sys.stderr = self.streams
+        shutil.rmtree(self.dir)
+
+    def rebuild_missing(self):
+        from clevercss.incremental import IncrementalCompiler
+        command = imp.load_source('ccss_command', os.path.join(ROOT, 'bin', 'ccss'))
+        fname = os.path.join(self.dir, 'a.ccss')
+        target = os.path.join(self.dir, 'a.css')
+        compiler = IncrementalCompiler(fname=fname)
+        ## mid-save, the file isn't there
+        command.rebuild(fname, target, compiler)
+        self.assertTrue('Error in file %s' % fname in sys.stderr.getvalue())
+        self.assertFalse(os.path.exists(target))
+        open(fname, 'w').write('a:\n// note\n    top: 1px\n')
+        command.rebuild(fname, target, compiler)
+        self.assertEqual(open(target).read(), 'a {\n  top: 1px;\n}\n')
+
+all_tests = magictest.suite(__name__)
+
+# vim: et sw=4 sts=4
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+from textwrap import dedent
+
+import magictest
+from magictest import MagicTest as TestCase
+
+import clevercss
+from clevercss import cache
+from clevercss.optimize import Constant
+
+def attrs(source):
+    tree = cache.raw_parse(dedent(source))
+    return dict((item.attr.value, item.value) for item in tree.body[-1].body)
+
+class Folding(TestCase):
+    def literals(self):
+        folded = attrs('''
+        div:
+            padding: 2px + 2px
+            top: (5+4 - 1) /2
+            margin: -2px -2px
+            color: #f00
+            left: auto
+        ''')
+        self.assertEqual(str(folded['padding'].value), '4px')
+        self.assertEqual(str(folded['top'].value), '4')
+        self.assertEqual(folded['margin'].value, '-2px -2px')
+        self.assertTrue(isinstance(folded['color'], Constant))
+        self.assertFalse(isinstance(folded['left'], Constant))
+
+    def variables(self):
+        folded = attrs('''
+        once = 2px
+        twice = 1
+        twice = 2
+        div:
+            a: once * 2
+            b: twice
+        ''')
+        self.assertEqual(str(folded['a'].value), '4px')
+        self.assertFalse(isinstance(folded['b'], Constant))
+
+    def shadowed(self):
+        source = dedent('''
+        size = 2
+        @box(size):
+            width: size
+        div:
+            size = 3
+            @box(5)
+            height: size
+        ''')
+        self.assertEqual(clevercss.convert(source), 'div {\n  width: 5;\n  height: 3;\n}\n')
+        body = cache.raw_parse(source).body
+        self.assertFalse(isinstance(body[1].body[0].value, Constant))
+        self.assertFalse(isinstance(body[2].body[2].value, Constant))
+
+    def before_assignment(self):
+        folded = attrs('''
+        div:
+            width: late
+        late = 4
+        p:
+            width: late
+        ''')
+        self.assertTrue(isinstance(folded['width'], Constant))
+        tree = cache.raw_parse('div:\n    width: late\nlate = 4\n')
+        self.assertFalse(isinstance(tree.body[0].body[0].value, Constant))
+
+all_tests = magictest.suite(__name__)
+
+# vim: et sw=4 sts=4
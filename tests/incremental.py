@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+import magictest
+from magictest import MagicTest as TestCase
+
+import clevercss
+from clevercss.incremental import IncrementalCompiler, split_blocks
+
+source = '''size = 4
+@something:
+    color: green
+    a:
+        font-size: 2px*size
+body:
+    height: 20px
+    @something()
+.one, .two:
+    top: 5px
+div:
+    width: size
+'''
+
+class Incremental(TestCase):
+    def split(self):
+        self.assertEqual(len(split_blocks(source)), 5)
+        self.assertEqual(''.join(split_blocks(source)), source)
+
+    def comments(self):
+        ## a comment at column 0 doesn't end the rule it is in
+        for text in ('a:\n// note\n    top: 1px\nb:\n    top: 2px\n',
+                     '// leading\n\na:\n\n    top: 1px // trailing\n  // indented\nb:\n    top: 2px\n'):
+            self.assertEqual(IncrementalCompiler().compile(text), clevercss.convert(text))
+            self.assertEqual(len(split_blocks(text)), 2)
+
+    def unchanged(self):
+        compiler = IncrementalCompiler(indent=4)
+        self.assertEqual(compiler.compile(source), clevercss.convert(source, indent=4))
+        self.assertEqual(compiler.translated, 5)
+        compiler.compile(source)
+        self.assertEqual((compiler.translated, compiler.reused), (2, 3))
+
+    def edit_rule(self):
+        compiler = IncrementalCompiler(indent=4)
+        compiler.compile(source)
+        edited = source.replace('top: 5px', 'top: 6px')
+        self.assertEqual(compiler.compile(edited), clevercss.convert(edited, indent=4))
+        self.assertEqual((compiler.translated, compiler.reused), (3, 2))
+
+    def edit_dependency(self):
+        compiler = IncrementalCompiler(indent=4)
+        compiler.compile(source)
+        edited = source.replace('size = 4', 'size = 5')
+        self.assertEqual(compiler.compile(edited), clevercss.convert(edited, indent=4))
+        ## body (through the mixin) and div use size; .one, .two does not
+        self.assertEqual((compiler.translated, compiler.reused), (4, 1))
+
+all_tests = magictest.suite(__name__)
+
+# vim: et sw=4 sts=4
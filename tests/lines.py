@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+from textwrap import dedent
+
+import magictest
+from magictest import MagicTest as TestCase
+
+import clevercss
+from clevercss import lines, cache, optimize, bench
+from clevercss.grammar import grammar
+from codetalker.pgm.errors import ParseError
+
+import parsing
+
+def without_positions(data):
+    if type(data) is tuple:
+        if data and data[0] == 't':
+            return data[:3]
+        return tuple(without_positions(item) for item in data)
+    return data
+
+def shape(tree):
+    return without_positions(cache.dump_tree(tree))
+
+class Lines(TestCase):
+    def same_trees(self):
+        for source in [case[0] for case in parsing.cases] + [bench.generate(3, 3)]:
+            self.assertEqual(shape(lines.parse(source)),
+                             shape(grammar.to_ast(grammar.process(source))))
+
+    def comments(self):
+        tree = lines.parse('// heading\na = "//not a comment" // but this is\n')
+        self.assertEqual(len(tree.body), 1)
+        self.assertEqual(tree.body[0].value.values[0].left.left.literal.value, '"//not a comment"')
+
+    def errors(self):
+        for source, lineno in (('a:\n    top: 1\n  left: 2\n', 3),
+                               ('a:\ntop: 1\n', 2),
+                               ('top: 1\n', 1),
+                               ('a:\n    top: 1 +\n', 2),
+                               ('a:\n', 2)):
+            try:
+                lines.parse(source)
+            except ParseError, e:
+                self.assertEqual(e.lineno, lineno)
+            else:
+                self.fail('parsed %r' % source)
+
+    def shared_expressions(self):
+        ## the second "top: a" is folded, the first must not be
+        tree = lines.parse('x:\n    top: a\na = 1\ny:\n    top: a\n')
+        self.assertTrue(tree.body[0].body[0].value is tree.body[2].body[0].value)
+        optimize.fold(tree)
+        self.assertFalse(isinstance(tree.body[0].body[0].value, optimize.Constant))
+        self.assertTrue(isinstance(tree.body[2].body[0].value, optimize.Constant))
+        self.assertEqual(clevercss.convert('a = 2\nx:\n    top: a\na = 1\ny:\n    top: a\n'),
+                         'x {\n  top: 2;\n}\ny {\n  top: 1;\n}\n')
+
+all_tests = magictest.suite(__name__)
+
+# vim: et sw=4 sts=4
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+from textwrap import dedent
+
+import magictest
+from magictest import MagicTest as TestCase
+
+from clevercss import cache
+from clevercss.ctranslator import CCSS, new_scope, TranslateError
+
+def translate(source):
+    scope = new_scope(indent=4)
+    return CCSS.translate(cache.raw_parse(dedent(source)), scope), scope
+
+class Mixins(TestCase):
+    def memoized(self):
+        css, scope = translate('''
+        @box(w):
+            width: w
+            border: 1px + 1px
+        a:
+            @box(2px)
+        b:
+            @box(2px)
+        c:
+            @box(3px)
+        ''')
+        self.assertEqual(css, dedent('''\
+        a {
+            width: 2px;
+            border: 2px;
+        }
+        b {
+            width: 2px;
+            border: 2px;
+        }
+        c {
+            width: 3px;
+            border: 2px;
+        }
+        '''))
+        mixin = scope.vbls.lookup('box')
+        self.assertEqual(mixin.body[1], 'border: 2px;\n')
+        ## a and b share a call; c has a different argument
+        self.assertEqual(mixin.calls.hits, 1)
+
+    def free_variables(self):
+        css, scope = translate('''
+        size = 1
+        @box:
+            width: size
+        a:
+            @box()
+        size = 2
+        b:
+            @box()
+        ''')
+        self.assertEqual(css, 'a {\n    width: 1;\n}\nb {\n    width: 2;\n}\n')
+
+    def nested_calls(self):
+        ## the variables of a mixin called by a mixin are part of the memo key
+        css, scope = translate('''
+        @inner:
+            width: w
+        @outer:
+            @inner()
+        a:
+            w = 1px
+            @outer()
+            w = 2px
+            @outer()
+        b:
+            w = 3px
+            @outer()
+        ''')
+        self.assertEqual(css, dedent('''\
+        a {
+            width: 1px;
+            width: 2px;
+        }
+        b {
+            width: 3px;
+        }
+        '''))
+
+    def nested_selectors(self):
+        css, scope = translate('''
+        @box:
+            span:
+                top: 0
+        a:
+            @box()
+        b:
+            @box()
+        ''')
+        self.assertEqual(css, 'a span {\n    top: 0;\n}\nb span {\n    top: 0;\n}\n')
+
+    def missing_argument(self):
+        self.assertRaises(TranslateError, translate, '''
+        @box(a, b, c=1):
+            width: a
+        a:
+            @box(1)
+        ''')
+
+all_tests = magictest.suite(__name__)
+
+# vim: et sw=4 sts=4
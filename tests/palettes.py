@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+from textwrap import dedent
+
+import magictest
+from magictest import MagicTest as TestCase
+
+import clevercss
+from clevercss import values
+
+def colors(*texts):
+    return values.ColorArray([values.color(text) for text in texts])
+
+class Palettes(TestCase):
+    def ramp(self):
+        ramp = values.palette(values.color('#000'), values.color('#fff'), values.number('5'))
+        self.assertEqual(ramp.value, ((0, 0, 0), (64, 64, 64), (128, 128, 128),
+                                      (191, 191, 191), (255, 255, 255)))
+
+    def batch_operations(self):
+        row = colors('#336699', '#808080', '#f0f0f0')
+        self.assertEqual(row.brighten(values.number('10%')).value,
+                         ((56, 112, 168), (141, 141, 141), (255, 255, 255)))
+        self.assertEqual(row.darken(values.number('50%')).value,
+                         ((26, 51, 77), (64, 64, 64), (120, 120, 120)))
+        self.assertEqual(row.mix(values.color('#fff'), values.number('0')).value,
+                         ((255, 255, 255),) * 3)
+        self.assertEqual((row - values.color('#101010')).value,
+                         ((35, 86, 137), (112, 112, 112), (224, 224, 224)))
+
+    def pure_python(self):
+        row = colors(*('#336699', '#808080', '#f0f0f0') * values.NUMPY_MIN)
+        expected = (row.brighten(values.number('15%')).value,
+                    row.mix(row.darken(), values.number('30%')).value,
+                    (row * values.number('2')).value)
+        backend, values.numpy = values.numpy, False
+        try:
+            self.assertEqual((row.brighten(values.number('15%')).value,
+                              row.mix(row.darken(), values.number('30%')).value,
+                              (row * values.number('2')).value), expected)
+        finally:
+            values.numpy = backend
+
+    def single_colors(self):
+        self.assertEqual(str(values.color('#336699').brighten(values.number('20%'))), '#3d7ab8')
+        self.assertEqual(str(values.color('#336699').darken()), '#2e5c8a')
+        self.assertRaises(ValueError, values.color('#336699').darken, values.number('1px'))
+
+    def stylesheet(self):
+        css = clevercss.convert(dedent('''\
+        ramp = palette(#000, #fff, 3)
+        a:
+            color: ramp[1]
+            background: ramp.darken(100%)[2]
+        '''))
+        self.assertEqual(css, 'a {\n  color: gray;\n  background: black;\n}\n')
+
+all_tests = magictest.suite(__name__)
+
+# vim: et sw=4 sts=4
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+import magictest
+from magictest import MagicTest as TestCase
+
+import clevercss
+from clevercss import ctranslator
+from clevercss.profiler import Profiler
+
+SOURCE = '''\
+@box(w):
+    width: w
+a:
+    color: #f00
+    @box(2px + 1px)
+    b:
+        top: 0
+'''
+
+class Profiling(TestCase):
+    def phases(self):
+        profiler = Profiler()
+        css = clevercss.convert(SOURCE, profiler=profiler)
+        self.assertEqual(css, clevercss.convert(SOURCE))
+        self.assertEqual(sorted(profiler.phases), ['fold', 'parse', 'translate'])
+
+    def nodes(self):
+        profiler = Profiler()
+        clevercss.convert(SOURCE, profiler=profiler)
+        nodes = profiler.as_dict()['nodes']
+        self.assertEqual(nodes['RuleDef']['calls'], 3)
+        self.assertEqual(nodes['Declare']['calls'], 1)
+        total = sum(node['seconds'] for node in nodes.itervalues())
+        self.assertTrue(total <= profiler.phases['translate'][0])
+
+    def callback(self):
+        seen = []
+        clevercss.convert(SOURCE, profiler=Profiler(lambda *args: seen.append(args[:2])))
+        self.assertTrue(('phase', 'parse') in seen)
+        self.assertTrue(('node', 'Attribute') in seen)
+
+    def uninstalled(self):
+        clevercss.convert(SOURCE, profiler=Profiler())
+        self.assertEqual(ctranslator.emit_rule.__module__, 'clevercss.ctranslator')
+        self.assertEqual(ctranslator.CCSS.translate.__name__, 'translate')
+        self.assertTrue(hasattr(ctranslator.CCSS.translate, 'im_func'))
+
+all_tests = magictest.suite(__name__)
+
+# vim: et sw=4 sts=4
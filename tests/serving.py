@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import socket
+import tempfile
+import threading
+
+import magictest
+from magictest import MagicTest as TestCase
+
+import clevercss
+from clevercss import server
+
+SOURCE = 'a:\n    color: red.darken()\n    top: 1px + 2px\n'
+
+class Serving(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'ccss.sock')
+        self.server = server.Server(self.path)
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,))
+        self.thread.start()
+        self.client = server.Client(self.path, timeout=10)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.thread.join()
+        shutil.rmtree(self.directory)
+
+    def convert(self):
+        self.assertTrue(self.client.ping())
+        self.assertEqual(self.client.convert(SOURCE, indent=4), clevercss.convert(SOURCE, indent=4))
+        self.assertEqual(self.client.convert(u'a:\n    content: "\xe9"\n'),
+                         u'a {\n  content: "\xe9";\n}\n')
+
+    def errors(self):
+        for source, kind in (('a:\n    top: ???\n', 'ParseError'),
+                             ('a:\n    top: 1px + 1em\n', 'ValueError')):
+            try:
+                self.client.convert(source)
+            except server.RemoteError, e:
+                self.assertEqual(e.kind, kind)
+            else:
+                self.fail('compiled %r' % source)
+        ## the connection survives them
+        self.assertEqual(self.client.convert('a:\n    top: 0\n'), 'a {\n  top: 0;\n}\n')
+
+    def protocol(self):
+        response = self.client.request({'id': 3, 'sauce': ''})
+        self.assertEqual((response['id'], response['kind']), (3, 'ProtocolError'))
+        self.assertEqual(self.client.request({'command': 'reboot'})['kind'], 'ProtocolError')
+        self.assertEqual(self.client.request(['source'])['kind'], 'ProtocolError')
+        self.assertEqual(self.client.request({'id': 'x', 'source': 'a = 1\n'}),
+                         {'id': 'x', 'css': ''})
+        self.assertEqual(self.client.stats()['requests'], 4)
+
+    def concurrent(self):
+        results = {}
+        def work(i):
+            client = server.Client(self.path, timeout=10)
+            try:
+                results[i] = client.convert('a%d:\n    top: %dpx\n' % (i, i))
+            finally:
+                client.close()
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(40)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, dict((i, 'a%d {\n  top: %dpx;\n}\n' % (i, i)) for i in range(40)))
+
+    def one_server_per_socket(self):
+        self.assertRaises(ValueError, server.Server, self.path)
+
+    def addresses(self):
+        self.assertEqual(server.parse_address('/tmp/x.sock'), ('unix', '/tmp/x.sock'))
+        self.assertEqual(server.parse_address('unix:x.sock'), ('unix', 'x.sock'))
+        self.assertEqual(server.parse_address('7000'), ('tcp', ('127.0.0.1', 7000)))
+        self.assertEqual(server.parse_address('0.0.0.0:80'), ('tcp', ('0.0.0.0', 80)))
+        self.assertRaises(ValueError, server.parse_address, 'nowhere')
+
+class Stale(TestCase):
+    def stale_socket(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'ccss.sock')
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.bind(path)
+            sock.close()
+            ## nobody listens there any more, so a new server takes it over
+            server.Server(path).close()
+            self.assertFalse(os.path.exists(path))
+        finally:
+            shutil.rmtree(directory)
+
+all_tests = magictest.suite(__name__)
+
+# vim: et sw=4 sts=4
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+import operator
+import unittest
+
+import magictest
+from magictest import MagicTest as TestCase
+
+from clevercss import values, ctranslator
+
+_speedups = values._speedups
+
+NUMBERS = ('0', '12', '-3', '1.5', '.5', '-.25px', '10%', '2em', '3pt', '4pxx', '7.', '1.0px')
+ROWS = ((0, 0, 0), (51, 102, 153), (255, 255, 255))
+
+class Speedups(TestCase):
+    def setUp(self):
+        if _speedups is None:
+            raise unittest.SkipTest('the _speedups extension is not built')
+
+    def numbers(self):
+        for text in NUMBERS:
+            self.assertEqual(_speedups.parse_number(text), values.py_parse_number(text))
+        for text in ('', '-', 'px', '.'):
+            self.assertRaises(ValueError, _speedups.parse_number, text)
+
+    def number_math(self):
+        for left in NUMBERS:
+            for right in NUMBERS:
+                left_value = values.py_parse_number(left)
+                right_value = values.py_parse_number(right)
+                for op in (operator.add, operator.sub, operator.mul):
+                    for reverse in (False, True):
+                        try:
+                            expected = values.py_number_calc(left_value, right_value, op, reverse)
+                        except ValueError:
+                            self.assertRaises(ValueError, _speedups.number_calc,
+                                              left_value, right_value, op, reverse)
+                        else:
+                            self.assertEqual(_speedups.number_calc(left_value, right_value,
+                                                                   op, reverse), expected)
+
+    def color_math(self):
+        for op in (operator.add, operator.sub, operator.mul, operator.div,
+                   lambda a, b: a * .3 + b * .7):
+            for other in (2, 0.5, (1, 2, 3), ((1, 2, 3), (4, 5, 6), (7, 8, 9))):
+                self.assertEqual(_speedups.combine_rows(op, ROWS, (other,)),
+                                 values.py_combine_rows(op, ROWS, (other,)))
+        self.assertRaises(ZeroDivisionError, _speedups.combine_rows, operator.div, ROWS, (0,))
+
+    def translator(self):
+        self.assertEqual(ctranslator.indent('a\nb\n', 2), '  a\n  b\n')
+        self.assertTrue(ctranslator.CCSS.register[ctranslator.ast.BinOp] is _speedups.binop)
+
+class Fallbacks(TestCase):
+    ## what the extension is compared against, checked with or without it
+    def numbers(self):
+        self.assertEqual([values.py_parse_number(text) for text in NUMBERS],
+                         [(0, None), (12, None), (-3, None), (1.5, None), (.5, None),
+                          (-.25, 'px'), (10, '%'), (2, 'em'), (3, 'pt'), (4, 'px'),
+                          (7, None), (1, 'px')])
+        for text in ('', '-', 'px', '.'):
+            self.assertRaises(ValueError, values.py_parse_number, text)
+
+    def number_math(self):
+        self.assertEqual(values.py_number_calc((1, 'px'), (2, None), operator.add), (3, 'px'))
+        self.assertEqual(values.py_number_calc((1, None), (2, 'em'), operator.sub, True), (1, 'em'))
+        self.assertEqual(values.py_number_calc((1, 'px'), (2, 'px'), operator.mul), (2, 'px'))
+        self.assertEqual(values.py_number_calc((1, None), (2, None), operator.add), (3, None))
+        self.assertRaises(ValueError, values.py_number_calc, (1, 'px'), (2, 'em'), operator.add)
+
+    def color_math(self):
+        self.assertEqual(values.py_combine_rows(operator.mul, ROWS, (2,)),
+                         ((0, 0, 0), (102, 204, 255), (255, 255, 255)))
+        self.assertEqual(values.py_combine_rows(operator.sub, ROWS, ((1, 2, 3),)),
+                         ((0, 0, 0), (50, 100, 150), (254, 253, 252)))
+        self.assertEqual(values.py_combine_rows(lambda a, b: a * .3 + b * .7, ROWS,
+                                                (((10, 10, 10), (0, 0, 0), (20, 20, 20)),)),
+                         ((7, 7, 7), (15, 31, 46), (91, 91, 91)))
+        self.assertRaises(ZeroDivisionError, values.py_combine_rows, operator.div, ROWS, (0,))
+
+    def indent(self):
+        self.assertEqual(ctranslator.PURE['indent']('a\nb\n', 2), '  a\n  b\n')
+
+all_tests = magictest.suite(__name__)
+
+# vim: et sw=4 sts=4
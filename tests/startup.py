@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+import os
+import subprocess
+import sys
+
+import magictest
+from magictest import MagicTest as TestCase
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+## what importing clevercss must not pull in; each is slow to import or build
+HEAVY = ('clevercss.grammar', 'clevercss.ctranslator', 'clevercss.translator',
+         'numpy', 'cssutils')
+
+def imported_after(code):
+    '''The HEAVY modules loaded by running `code` in a fresh interpreter.'''
+    script = 'import sys\n%s\nprint " ".join(m for m in %r if m in sys.modules)' % (code, HEAVY)
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+    out = subprocess.Popen([sys.executable, '-c', script], stdout=subprocess.PIPE,
+                           env=env).communicate()[0]
+    return out.split()
+
+class Startup(TestCase):
+    def import_is_lazy(self):
+        self.assertEqual(imported_after('import clevercss; clevercss.VERSION; clevercss.consts.COLORS'), [])
+
+    def attributes(self):
+        loaded = imported_after('import clevercss\n'
+                                'from codetalker.pgm import Grammar, Translator\n'
+                                'assert isinstance(clevercss.grammar, Grammar)\n'
+                                'assert isinstance(clevercss.CCSS, Translator)\n'
+                                'import clevercss.grammar as grammar\n'
+                                'assert grammar is clevercss.grammar\n'
+                                'print "ok"')
+        self.assertEqual(loaded[0], 'ok')
+        self.assertTrue('clevercss.ctranslator' in loaded)
+
+    def values_are_lazy(self):
+        self.assertEqual(imported_after('from clevercss import values; values.number("1px") + values.number("2px")'), [])
+
+    def convert_builds_the_compiler(self):
+        loaded = imported_after('import clevercss; clevercss.convert("a:\\n    top: 1px\\n")')
+        self.assertTrue('clevercss.ctranslator' in loaded)
+        self.assertTrue('cssutils' not in loaded)
+
+all_tests = magictest.suite(__name__)
+
+# vim: et sw=4 sts=4
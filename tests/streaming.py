@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+from StringIO import StringIO
+import os
+import tempfile
+
+import magictest
+from magictest import MagicTest as TestCase
+
+import clevercss
+from clevercss import cache, lines
+from clevercss.errors import ParseError
+
+source = '''@mixin(a):
+    color: a
+    em:
+        top: 1
+body:
+    left: 2
+    div:
+        p:
+            right: 3
+        @mixin(red)
+    width: 4
+'''
+
+class Streaming(TestCase):
+    def setUp(self):
+        self.old = cache.result_cache
+        cache.result_cache = None
+
+    def tearDown(self):
+        cache.result_cache = self.old
+
+    def same_as_convert(self):
+        chunks = list(clevercss.convert_iter(source, indent=4))
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(''.join(chunks), clevercss.convert(source, indent=4))
+
+    def order(self):
+        self.assertEqual(clevercss.convert(source, indent=4), '''\
+body {
+    left: 2;
+    width: 4;
+}
+body div {
+    color: red;
+}
+body div p {
+    right: 3;
+}
+body div em {
+    top: 1;
+}
+''')
+
+class Writing(TestCase):
+    def setUp(self):
+        self.old = cache.result_cache
+        cache.result_cache = None
+
+    def tearDown(self):
+        cache.result_cache = self.old
+
+    def convert_to(self):
+        out = StringIO()
+        clevercss.convert_to(source, out, indent=4)
+        self.assertEqual(out.getvalue(), clevercss.convert(source, indent=4))
+
+    def from_file(self):
+        fd, name = tempfile.mkstemp(suffix='.ccss')
+        try:
+            os.write(fd, 'w = 2px\r\n' + source)
+            os.close(fd)
+            out = StringIO()
+            clevercss.convert_to(lines.read_lines(open(name)), out, {'red': 'blue'})
+            self.assertEqual(out.getvalue(), clevercss.convert('w = 2px\n' + source, {'red': 'blue'}))
+            open(name, 'w').close()
+            self.assertEqual(list(lines.read_lines(open(name))), [])
+        finally:
+            os.remove(name)
+
+    def statement_by_statement(self):
+        ## each statement comes out before the lines after the next are read
+        read = []
+        def feed():
+            for line in ['a:\n', '    top: 1\n', 'b:\n', '    top: 2\n', '  bad\n']:
+                read.append(line)
+                yield line
+        statements = lines.iter_statements(feed())
+        self.assertEqual(statements.next().selector.value, 'a:')
+        self.assertEqual(len(read), 3)
+        self.assertRaises(ParseError, statements.next)
+
+all_tests = magictest.suite(__name__)
+
+# vim: et sw=4 sts=4
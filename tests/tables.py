@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+import marshal
+import os
+import shutil
+import sys
+import tempfile
+
+import magictest
+from magictest import MagicTest as TestCase
+
+from clevercss import grammar_table, cache, bench
+from clevercss.grammar import build
+
+import parsing
+
+## clevercss.grammar is the Grammar instance, not the module
+namespace = vars(sys.modules['clevercss.grammar'])
+
+class Tables(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'grammar.table')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def same_grammar(self):
+        grammar_table.write(self.path)
+        built, loaded = build(), grammar_table.load(namespace, self.path)
+        self.assertEqual(loaded.rule_names, built.rule_names)
+        self.assertEqual(loaded.tokens, built.tokens)
+        self.assertEqual(loaded.ast_attrs, built.ast_attrs)
+        self.assertEqual(sorted(vars(loaded.ast_classes)), sorted(vars(built.ast_classes)))
+        self.assertTrue(loaded.rules[0].grammar is loaded)
+
+    def same_trees(self):
+        grammar_table.write(self.path)
+        built, loaded = build(), grammar_table.load(namespace, self.path)
+        for source in [case[0] for case in parsing.cases] + [bench.generate(3, 3)]:
+            self.assertEqual(cache.dump_tree(loaded.to_ast(loaded.process(source))),
+                             cache.dump_tree(built.to_ast(built.process(source))))
+
+    def missing(self):
+        self.assertEqual(grammar_table.load(namespace, self.path), None)
+
+    def out_of_date(self):
+        grammar_table.write(self.path)
+        stored, data = marshal.load(open(self.path, 'rb'))
+        marshal.dump(('0' * len(stored), data), open(self.path, 'wb'))
+        self.assertEqual(grammar_table.load(namespace, self.path), None)
+
+    def compiled_codetalker(self):
+        ## a rebuilt cgrammar may read the tables differently
+        from codetalker import cgrammar
+        grammar_table.write(self.path)
+        other = os.path.join(self.directory, 'cgrammar.so')
+        open(other, 'wb').write(open(cgrammar.__file__, 'rb').read() + 'rebuilt')
+        old, cgrammar.__file__ = cgrammar.__file__, other
+        try:
+            self.assertEqual(grammar_table.load(namespace, self.path), None)
+        finally:
+            cgrammar.__file__ = old
+
+    def failing_load(self):
+        import codetalker.cgrammar
+        grammar_table.write(self.path)
+        def consume_grammar(*args):
+            raise RuntimeError('incompatible table')
+        old, codetalker.cgrammar.consume_grammar = codetalker.cgrammar.consume_grammar, consume_grammar
+        try:
+            self.assertEqual(grammar_table.load(namespace, self.path), None)
+        finally:
+            codetalker.cgrammar.consume_grammar = old
+
+    def corrupt(self):
+        open(self.path, 'wb').write('not a table')
+        self.assertEqual(grammar_table.load(namespace, self.path), None)
+
+all_tests = magictest.suite(__name__)
+
+# vim: et sw=4 sts=4
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+from textwrap import dedent
+
+import magictest
+from magictest import MagicTest as TestCase
+
+import clevercss
+from clevercss import cache, values
+from clevercss.themes import ThemeCompiler
+from clevercss.errors import TranslateError
+
+BASE = dedent('''\
+    size = 10px
+    a:
+        color: primary
+        border: 1px solid primary.darken(10%)
+        width: size * 2
+    ''')
+
+def css(primary, darker):
+    return 'a {\n  color: %s;\n  border: 1px solid %s;\n  width: 20px;\n}\n' % (primary, darker)
+
+class Variables(TestCase):
+    def variables(self):
+        self.assertEqual(clevercss.convert(BASE, {'primary': '#336699'}), css('#336699', '#2e5c8a'))
+        self.assertEqual(clevercss.convert(BASE, {'primary': values.color('#fff')}),
+                         css('white', '#e6e6e6'))
+
+    def stylesheet_wins(self):
+        self.assertEqual(clevercss.convert(BASE, {'primary': 'red', 'size': '1px'}),
+                         css('red', '#e60000'))
+
+    def iter_and_profile(self):
+        from clevercss.profiler import Profiler
+        expected = clevercss.convert(BASE, {'primary': 'red'})
+        self.assertEqual(''.join(clevercss.convert_iter(BASE, {'primary': 'red'})), expected)
+        self.assertEqual(clevercss.convert(BASE, {'primary': 'red'}, profiler=Profiler()), expected)
+
+    def invalid(self):
+        self.assertRaises(TranslateError, clevercss.convert, BASE, {'primary': '1px +'})
+
+class Many(TestCase):
+    def setUp(self):
+        self.results, cache.result_cache = cache.result_cache, None
+
+    def tearDown(self):
+        cache.result_cache = self.results
+
+    def many(self):
+        themes = [{'primary': '#336699'}, {'primary': 'red'}, {'primary': 'white'}]
+        expected = [clevercss.convert(BASE, theme) for theme in themes]
+        self.assertEqual(list(clevercss.convert_many(BASE, themes)), expected)
+        self.assertEqual(list(clevercss.convert_many(BASE, themes, processes=2)), expected)
+
+    def lazy(self):
+        ## a generator: nothing is converted until it is asked for
+        results = clevercss.convert_many(BASE, [{'primary': 'red'}, {'primary': '1px +'}])
+        self.assertEqual(results.next(), css('red', '#e60000'))
+        self.assertRaises(TranslateError, results.next)
+
+THEMED = dedent('''\
+    dark = primary.darken(20%)
+    gap = 4px
+    @box(width=gap):
+        padding: width
+        border: 1px solid dark
+    body:
+        color: text
+        margin: gap
+    a:
+        color: primary
+        :hover:
+            color: dark
+        span:
+            top: gap
+    div:
+        @box(gap * 2)
+    p:
+        width: gap * 10
+    gap = 8px
+    em:
+        left: gap
+    ''')
+
+class Patching(TestCase):
+    def setUp(self):
+        self.results, cache.result_cache = cache.result_cache, None
+        self.base = {'primary': '#336699', 'text': 'black'}
+        self.themes = ThemeCompiler(THEMED, self.base)
+
+    def tearDown(self):
+        cache.result_cache = self.results
+
+    def same(self):
+        for overrides in ({}, {'primary': 'red'}, {'text': '#123'}, {'primary': 'red', 'text': 'blue'},
+                          {'gap': '1px'}, {'primary': values.color('#fff')}, {'new': '1px'}):
+            self.assertEqual(self.themes.compile(overrides),
+                             clevercss.convert(THEMED, dict(self.base, **overrides)))
+
+    def proportional(self):
+        self.themes.compile({'text': 'white'})
+        self.assertEqual(self.themes.translated, 1)
+        self.themes.compile({'primary': 'red'})
+        ## dark, the mixin using it, a's color and hover and the call in div
+        self.assertEqual(self.themes.translated, 5)
+        self.themes.compile({'primary': '#336699'})
+        self.assertEqual(self.themes.translated, 0)
+
+    def invalid(self):
+        self.assertRaises(TranslateError, self.themes.compile, {'primary': '1px +'})
+        self.assertRaises(AttributeError, self.themes.compile, {'primary': '1px'})
+
+all_tests = magictest.suite(__name__)
+
+# vim: et sw=4 sts=4
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+
+import copy
+
+import magictest
+from magictest import MagicTest as TestCase
+
+from clevercss.variables import Variables
+
+class VariablesTest(TestCase):
+    def shadowing(self):
+        vbls = Variables([{'a': 1, 'b': 2}])
+        vbls.push()
+        vbls.assign('a', 3)
+        self.assertEqual((vbls.lookup('a'), vbls.lookup('b')), (3, 2))
+        vbls.pop()
+        self.assertEqual(vbls.lookup('a'), 1)
+
+    def invalidation(self):
+        vbls = Variables([{'a': 1}])
+        vbls.insert(0, {})
+        self.assertEqual(vbls.lookup('a'), 1)
+        vbls[0]['a'] = 2
+        self.assertEqual(vbls.lookup('a'), 2)
+        vbls[-1]['a'] = 5
+        self.assertEqual(vbls.lookup('a'), 2)
+        vbls.pop(0)
+        self.assertEqual(vbls.lookup('a'), 5)
+
+    def list_layout(self):
+        vbls = Variables([{'inner': 1}, {'outer': 2}])
+        self.assertEqual(len(vbls), 2)
+        self.assertEqual([dict(frame) for frame in vbls], [{'inner': 1}, {'outer': 2}])
+        self.assertRaises(KeyError, vbls.lookup, 'missing')
+
+    def deepcopy(self):
+        vbls = Variables([{'a': 1}])
+        other = copy.deepcopy(vbls)
+        other.assign('a', 2)
+        self.assertEqual((vbls.lookup('a'), other.lookup('a')), (1, 2))
+
+all_tests = magictest.suite(__name__)
+
+# vim: et sw=4 sts=4